@@ -1,26 +1,94 @@
 # src/agents/llm_qa_agent.py
 from typing import List, Dict, Optional
+import json
 import os
+import re
+import time
 from .qa_agent import QAGeneratorAgent
+from ..utils.metrics import REGISTRY
+
+LLM_LATENCY = REGISTRY.histogram("llm_request_duration_seconds", "Latency of LLM refinement requests.",
+                                 labels=("provider",))
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total",
+                                "LLM refinement requests by outcome (ok / empty / error).",
+                                labels=("provider", "outcome"))
+LLM_FALLBACKS = REGISTRY.counter("llm_refine_fallbacks_total",
+                                 "QA items that kept their deterministic answer because refinement failed.",
+                                 labels=("provider",))
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def parse_batch_reply(text: Optional[str], ids: List[str]) -> Dict[str, str]:
+    """
+    Parse a batched refinement reply of the form {"<id>": "<answer>", ...}.
+    Tolerates code fences / surrounding prose; returns only ids that were asked for
+    and have a non-empty string answer (missing or malformed items are dropped).
+    """
+    if not text:
+        return {}
+    match = _JSON_OBJECT.search(text)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    wanted = set(ids)
+    return {k: v.strip() for k, v in data.items() if k in wanted and isinstance(v, str) and v.strip()}
+
+
+def _env_batch_size() -> Optional[int]:
+    raw = os.getenv("LLM_BATCH_SIZE", "").strip()
+    if not raw:
+        return None
+    if raw.lower() == "all":
+        return 0
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError(f"LLM_BATCH_SIZE must be 'all' or a non-negative integer, got {raw!r}")
+    return value
+
 
 # Optional imports for OpenAI — imported inside functions to avoid hard dependency
 class HybridQAGeneratorAgent:
     """
     Wraps the deterministic QAGeneratorAgent and optionally refines answers with an LLM.
     LLM usage is behind OPENAI_API_KEY environment variable — tests remain deterministic.
+
+    By default every QA item is refined with its own request. With batch_size set
+    (or LLM_BATCH_SIZE in the environment; 0 / "all" means one request per product),
+    items are packed into one prompt per chunk that asks for a JSON reply keyed by
+    item id; items missing from or malformed in the reply keep their deterministic answer.
+    client: optional object with complete(prompt, max_tokens) -> str used instead
+    of OpenAI (e.g. another provider or a local fake in tests).
     """
 
-    def __init__(self, llm_provider: Optional[str] = None):
+    def __init__(self, llm_provider: Optional[str] = None, batch_size: Optional[int] = None, client=None):
         # llm_provider is a placeholder if you want to add different providers later
         self.base = QAGeneratorAgent()
         self.api_key = os.getenv("OPENAI_API_KEY")  # if present, agent will attempt to refine
         self.llm_provider = llm_provider or "openai"
+        self.client = client
+        if batch_size is None:
+            batch_size = _env_batch_size()
+        elif batch_size < 0:
+            raise ValueError(f"batch_size must be >= 0 (0 means one request per product), got {batch_size}")
+        self.batch_size = batch_size
 
     def run(self, product) -> List[Dict]:
         deterministic = self.base.run(product)
-        if not self.api_key:
+        if not self.api_key and self.client is None:
             return deterministic
 
+        if self.batch_size is not None:
+            return self._refine_batched(deterministic, product)
+
         # If API key present, refine answers. We keep a safe, rate-limited approach:
         refined = []
         for item in deterministic:
@@ -28,36 +96,78 @@ class HybridQAGeneratorAgent:
             a = item["a"]
             # Attempt to refine via OpenAI (if installed); otherwise return original
             refined_answer = self._maybe_refine_with_openai(q, a, product)
+            if not refined_answer:
+                LLM_FALLBACKS.labels(provider=self.llm_provider).inc()
             item["a"] = refined_answer or a
             refined.append(item)
         return refined
 
+    def _refine_batched(self, items: List[Dict], product) -> List[Dict]:
+        size = self.batch_size or len(items)
+        for start in range(0, len(items), size):
+            chunk = items[start:start + size]
+            # short positional ids keep the prompt small; map back to the items here
+            ids = [str(i + 1) for i in range(len(chunk))]
+            prompt = self._batch_prompt(chunk, ids, product)
+            answers = parse_batch_reply(self._complete(prompt, max_tokens=80 * len(chunk) + 50), ids)
+            for item_id, item in zip(ids, chunk):
+                if item_id in answers:
+                    item["a"] = answers[item_id]
+                else:
+                    LLM_FALLBACKS.labels(provider=self.llm_provider).inc()
+        return items
+
+    @staticmethod
+    def _batch_prompt(chunk: List[Dict], ids: List[str], product) -> str:
+        payload = [{"id": i, "q": item["q"], "a": item["a"]} for i, item in zip(ids, chunk)]
+        return (
+            f"Rephrase each answer concisely and clearly. Context product: {product.name}. "
+            "Do not add facts that are not in the existing answer.\n"
+            f"Items (JSON): {json.dumps(payload, ensure_ascii=False)}\n"
+            'Reply with only a JSON object mapping each item id to its refined answer, e.g. {"1": "..."}.'
+        )
+
     def _maybe_refine_with_openai(self, q: str, a: str, product) -> Optional[str]:
         """
         Example refinement using OpenAI ChatCompletion. This function will only run if
         'openai' Python package is installed and OPENAI_API_KEY is set.
         We keep prompt minimal and deterministic fallback in case of any failure.
         """
-        try:
-            import openai
-        except Exception:
-            return None
+        # small prompt to rephrase and be concise
+        prompt = (
+            f"Rephrase the answer concisely and clearly. Context product: {product.name}. "
+            f"Question: {q}\nExisting answer: {a}\nRefined answer:"
+        )
+        return self._complete(prompt, max_tokens=150)
+
+    def _complete(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Send one prompt to the configured client / OpenAI; returns None on any failure."""
+        if self.client is None:
+            try:
+                import openai
+            except Exception:
+                return None
 
+        t0 = time.perf_counter()
+        outcome = "error"
         try:
-            openai.api_key = self.api_key
-            # small prompt to rephrase and be concise
-            prompt = (
-                f"Rephrase the answer concisely and clearly. Context product: {product.name}. "
-                f"Question: {q}\nExisting answer: {a}\nRefined answer:"
-            )
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o-mini" if hasattr(openai, "gpt4o") else "gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.0,
-            )
-            # parse safely
-            text = (resp["choices"][0]["message"]["content"]).strip()
+            if self.client is not None:
+                text = self.client.complete(prompt, max_tokens=max_tokens)
+            else:
+                openai.api_key = self.api_key
+                resp = openai.ChatCompletion.create(
+                    model="gpt-4o-mini" if hasattr(openai, "gpt4o") else "gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=0.0,
+                )
+                # parse safely
+                text = resp["choices"][0]["message"]["content"]
+            text = (text or "").strip()
+            outcome = "ok" if text else "empty"
             return text if text else None
         except Exception:
             return None
+        finally:
+            LLM_LATENCY.labels(provider=self.llm_provider).observe(time.perf_counter() - t0)
+            LLM_REQUESTS.labels(provider=self.llm_provider, outcome=outcome).inc()
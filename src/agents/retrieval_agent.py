@@ -1,54 +1,325 @@
 # src/agents/retrieval_agent.py
-from typing import List, Optional
+from typing import List, Optional, Iterable, Iterator, Union, Callable
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import logging
+import multiprocessing
+import os
+import time
 import numpy as np
+from ..utils.metrics import REGISTRY
+from ..utils.query_cache import QueryCache
 
 try:
     from sentence_transformers import SentenceTransformer
-    import faiss
 except Exception as e:
     # If these libs aren't installed, keep agent importable but non-functional.
     SentenceTransformer = None
+try:
+    import faiss
+except Exception as e:
     faiss = None
 
+ENCODE_LATENCY = REGISTRY.histogram("retrieval_encode_seconds", "Time spent embedding texts.", labels=("op",))
+SEARCH_LATENCY = REGISTRY.histogram("retrieval_search_seconds", "Time spent in FAISS index search.")
+ENCODED_TEXTS = REGISTRY.counter("retrieval_encoded_texts_total", "Texts embedded by the retrieval agent.",
+                                 labels=("op",))
+
+INDEX_TYPES = ("flat", "fp16", "sq8", "pq")
+
+logger = logging.getLogger("agentic-graph")
+
+ProgressFn = Callable[[int, int], None]
+
+
+def length_batches(texts: List[str], batch_size: int, max_batch_chars: Optional[int] = None) -> List[List[int]]:
+    """
+    Group text indices into batches of similar length (sorted by length), so the
+    tokenizer pads each batch only to its own longest text. A batch closes at
+    batch_size items, or earlier when max_batch_chars is set and
+    items * longest item would exceed that padded-size budget.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        longest = len(texts[i])  # sorted ascending, so the newest item is the longest
+        if current and (len(current) >= batch_size or
+                        (max_batch_chars and (len(current) + 1) * longest > max_batch_chars)):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+# per-process encoder for multi-process index builds
+_WORKER_MODEL = None
+
+
+def _init_encode_worker(model_name: str, model, threads: Optional[int]) -> None:
+    global _WORKER_MODEL
+    if threads:
+        # torch defaults to one intra-op thread per core in every process
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _WORKER_MODEL = model if model is not None else SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    embeddings = _WORKER_MODEL.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class CompactCorpus:
+    """
+    Read-only list of strings stored as one UTF-8 byte buffer plus an offsets array,
+    instead of one Python str object per item. Supports len(), indexing and iteration.
+    """
+
+    __slots__ = ("_buf", "_offsets")
+
+    def __init__(self, texts: Iterable[str]):
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        self._buf = b"".join(encoded)
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("CompactCorpus index out of range")
+        return self._buf[self._offsets[idx]:self._offsets[idx + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buf) + self._offsets.nbytes
+
+
 class RetrievalAgent:
     """
     Build an in-memory FAISS index over given texts and support semantic queries.
     If sentence-transformers / faiss not installed, this agent raises descriptive errors.
+
+    index_type selects how embeddings are stored:
+      - "flat": raw float32 vectors (exact, default)
+      - "fp16" / "sq8": scalar-quantized to 2 / 1 byte(s) per dimension
+      - "pq": product-quantized to pq_m bytes per vector
+    Compressed types also keep the corpus in a CompactCorpus. With rerank_k > 0, the
+    top rerank_k candidates are rescored at full precision, which recovers most of
+    the accuracy lost to quantization. With vectors_path set, build_index saves the
+    float32 embeddings there and rescoring reads the candidates' rows through a
+    memory map (disk, not RAM); without it, each query re-embeds its rerank_k
+    candidate texts, i.e. one extra model call over rerank_k texts per query.
+
+    build_index embeds the corpus in length-bucketed batches of batch_size texts;
+    with encode_workers > 1 the batches are spread over that many processes, each
+    loading its own copy of the model. Each worker's torch is limited to
+    threads_per_worker threads (None keeps torch's default of one per core), so the
+    build uses about encode_workers * threads_per_worker cores; leaving every worker
+    at the default oversubscribes the CPU and can be slower than a single process.
+
+    query_cache: optional QueryCache consulted before encoding/searching; it is
+    cleared once build_index has replaced the index.
+
+    index, corpus and vectors are swapped as one snapshot, so a query running during
+    build_index sees either the old or the new build, never a mix of the two.
     """
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        if SentenceTransformer is None or faiss is None:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_type: str = "flat",
+                 rerank_k: int = 0, pq_m: int = 16, model=None, encode_workers: int = 1,
+                 batch_size: int = 64, max_batch_chars: Optional[int] = None, mp_context: str = "spawn",
+                 threads_per_worker: Optional[int] = 1,
+                 query_cache: Optional[QueryCache] = None, vectors_path: Optional[Path] = None):
+        if faiss is None or (model is None and SentenceTransformer is None):
             raise RuntimeError("RetrievalAgent requires 'sentence-transformers' and 'faiss-cpu' installed.")
-        self.model = SentenceTransformer(model_name)
-        self.index = None
-        self.corpus: List[str] = []
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+        self.model_name = model_name
+        self._custom_model = model is not None
+        self.model = model if model is not None else SentenceTransformer(model_name)
+        self.encode_workers = encode_workers
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.mp_context = mp_context
+        self.threads_per_worker = threads_per_worker
+        self.index_type = index_type
+        self.rerank_k = rerank_k
+        self.pq_m = pq_m
+        self.query_cache = query_cache
+        self.vectors_path = Path(vectors_path) if vectors_path is not None else None
+        # (faiss index, corpus, full-precision vectors or None), replaced as a whole
+        self._snapshot = (None, [], None)
+
+    @property
+    def index(self):
+        return self._snapshot[0]
+
+    @property
+    def corpus(self) -> Union[List[str], CompactCorpus]:
+        return self._snapshot[1]
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self._snapshot[2]
 
-    def build_index(self, texts: List[str]):
+    def _encode(self, texts: List[str], op: str) -> np.ndarray:
+        t0 = time.perf_counter()
+        embeddings = self.model.encode(texts, convert_to_numpy=True)
+        ENCODE_LATENCY.labels(op=op).observe(time.perf_counter() - t0)
+        ENCODED_TEXTS.labels(op=op).inc(len(texts))
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _encode_corpus(self, texts: List[str], progress: Optional[ProgressFn] = None) -> np.ndarray:
+        batches = length_batches(texts, self.batch_size, self.max_batch_chars)
+        total = len(texts)
+        out: Optional[np.ndarray] = None
+        done = 0
+        next_log = 0.1
+        t0 = time.perf_counter()
+
+        def collect(ids: List[int], embeddings: np.ndarray) -> None:
+            nonlocal out, done, next_log
+            if out is None:
+                out = np.empty((total, embeddings.shape[1]), dtype=np.float32)
+            out[ids] = embeddings
+            done += len(ids)
+            if progress is not None:
+                progress(done, total)
+            elif len(batches) > 1 and done / total >= next_log:
+                logger.info("Encoded %d/%d texts (%.0f%%)", done, total, 100.0 * done / total)
+                next_log = (int(done * 10 / total) + 1) / 10
+
+        if self.encode_workers > 1 and len(batches) > 1:
+            # ship the model object only when it was injected; otherwise workers load by name
+            model = self.model if self._custom_model else None
+            ctx = multiprocessing.get_context(self.mp_context)
+            with ProcessPoolExecutor(max_workers=min(self.encode_workers, len(batches)), mp_context=ctx,
+                                     initializer=_init_encode_worker,
+                                     initargs=(self.model_name, model, self.threads_per_worker)) as pool:
+                futures = {pool.submit(_encode_in_worker, [texts[i] for i in ids]): ids for ids in batches}
+                for fut in as_completed(futures):
+                    collect(futures[fut], fut.result())
+        else:
+            for ids in batches:
+                batch = [texts[i] for i in ids]
+                collect(ids, np.asarray(self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True),
+                                        dtype=np.float32))
+
+        ENCODE_LATENCY.labels(op="build").observe(time.perf_counter() - t0)
+        ENCODED_TEXTS.labels(op="build").inc(total)
+        return out
+
+    def _make_index(self, embeddings: np.ndarray):
+        n, dim = embeddings.shape
+        if self.index_type == "fp16":
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+        elif self.index_type == "sq8":
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        elif self.index_type == "pq":
+            # m must divide dim, and k-means needs at least 2**nbits training points
+            m = max(d for d in range(1, min(self.pq_m, dim) + 1) if dim % d == 0)
+            nbits = min(8, int(np.log2(n))) if n > 1 else 0
+            if nbits < 1:
+                index = faiss.IndexFlatL2(dim)
+            else:
+                index = faiss.IndexPQ(dim, m, nbits)
+        else:
+            # use IndexFlatL2 for simplicity
+            index = faiss.IndexFlatL2(dim)
+        if not index.is_trained:
+            index.train(embeddings)
+        index.add(embeddings)
+        return index
+
+    def build_index(self, texts: List[str], progress: Optional[ProgressFn] = None):
         """
         texts: list of strings to index
+        progress: optional callback(done, total) after each encoded batch; by default
+        progress is logged every 10%
         """
         if not texts:
-            self.index = None
-            self.corpus = []
+            self._snapshot = (None, [], None)
+            self._invalidate_cache()
             return
 
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        dim = embeddings.shape[1]
-        # use IndexFlatL2 for simplicity
-        index = faiss.IndexFlatL2(dim)
-        index.add(np.array(embeddings).astype(np.float32))
-        self.index = index
-        self.corpus = texts.copy()
+        embeddings = self._encode_corpus(texts, progress)
+        index = self._make_index(embeddings)
+        corpus = texts.copy() if self.index_type == "flat" else CompactCorpus(texts)
+        vectors = None
+        if self.rerank_k and self.vectors_path is not None:
+            vectors = self._save_vectors(embeddings)
+        self._snapshot = (index, corpus, vectors)
+        self._invalidate_cache()
+
+    def _save_vectors(self, embeddings: np.ndarray) -> np.ndarray:
+        # write a sibling file and rename it over vectors_path: a memmap of the previous
+        # build keeps its own (now unlinked) file, so in-flight reranks never see a
+        # truncated file
+        path = self.vectors_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:  # np.save(path) would append ".npy"
+            np.save(f, embeddings)
+        os.replace(tmp, path)
+        return np.load(path, mmap_mode="r")
+
+    def _invalidate_cache(self) -> None:
+        # only after the new index is in place, so a query racing the build can't
+        # re-fill the cache from the old one (its put carries the old generation)
+        if self.query_cache is not None:
+            self.query_cache.clear()
 
     def query(self, query: str, top_k: int = 3) -> List[str]:
         """Return the top_k most similar texts (strings)."""
-        if self.index is None:
+        cache = self.query_cache
+        generation = cache.generation if cache is not None else None
+        index, corpus, vectors = self._snapshot
+        if index is None:
             return []
-        vec = self.model.encode([query], convert_to_numpy=True).astype(np.float32)
-        D, I = self.index.search(vec, top_k)
-        results = []
-        for idx in I[0]:
-            if idx < 0 or idx >= len(self.corpus):
-                continue
-            results.append(self.corpus[idx])
+        if cache is not None:
+            cached = cache.get(query, top_k)
+            if cached is not None:
+                return cached
+        t0 = time.perf_counter()
+        vec = self._encode([query], "query")
+        t1 = time.perf_counter()
+        if cache is not None:
+            cached = cache.get_similar(vec[0], top_k)
+            if cached is not None:
+                # remember the paraphrase as an exact-match alias only; giving it its own
+                # embedding would let later queries chain away from the original match
+                cache.put(query, top_k, cached, generation=generation)
+                return cached
+        k = max(top_k, self.rerank_k) if self.rerank_k else top_k
+        D, I = index.search(vec, k)
+        SEARCH_LATENCY.observe(time.perf_counter() - t1)
+        ids = [int(idx) for idx in I[0] if 0 <= idx < len(corpus)]
+        if self.rerank_k and len(ids) > 1:
+            ids = self._rerank(vec[0], ids, corpus, vectors)
+        results = [corpus[idx] for idx in ids[:top_k]]
+        if cache is not None:
+            cache.record_cost(t1 - t0, time.perf_counter() - t1)
+            cache.put(query, top_k, results, vec[0], generation=generation)
         return results
+
+    def _rerank(self, query_vec: np.ndarray, ids: List[int], corpus, vectors: Optional[np.ndarray]) -> List[int]:
+        if vectors is not None:
+            candidates = np.asarray(vectors[ids], dtype=np.float32)
+        else:
+            candidates = self._encode([corpus[i] for i in ids], "rerank")
+        dist = ((candidates - query_vec) ** 2).sum(axis=1)
+        return [ids[i] for i in np.argsort(dist, kind="stable")]
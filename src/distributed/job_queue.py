@@ -0,0 +1,242 @@
+# src/distributed/job_queue.py
+from abc import ABC, abstractmethod
+from typing import TypedDict, Dict, Any, Optional, List, Callable
+from pathlib import Path
+import functools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+class Job(TypedDict):
+    id: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    worker: Optional[str]
+
+
+class JobQueue(ABC):
+    """
+    At-least-once job queue used by distributed graph workers.
+    A claimed job is leased to one worker for visibility_timeout seconds; if it is
+    neither acked nor failed before the lease runs out it becomes visible again.
+    Jobs that exhaust max_attempts are moved to the dead-letter set.
+    Backends (SQLite here, Redis etc. later) implement this interface.
+    """
+
+    # seconds a claimed job stays leased; workers renew it while a job is running
+    visibility_timeout: float = 300.0
+
+    @abstractmethod
+    def enqueue(self, payload: Dict[str, Any], job_id: Optional[str] = None,
+                max_attempts: Optional[int] = None) -> Optional[str]:
+        """Returns the new job id, or None if a job with job_id already exists."""
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str, visibility_timeout: Optional[float] = None) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    def ack(self, job_id: str, worker_id: str, result: Optional[Any] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        pass
+
+    @abstractmethod
+    def extend_lease(self, job_id: str, worker_id: str, visibility_timeout: Optional[float] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at, created_at);
+"""
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    File-based JobQueue backend. Every worker process opens the same database file;
+    claims run inside BEGIN IMMEDIATE transactions so two workers never lease the
+    same job. One instance may be shared by threads (e.g. a lease heartbeat).
+
+    The default journal_mode="WAL" needs shared memory between processes, so it only
+    works for workers on one host. To share the file between hosts, use
+    journal_mode="DELETE" and put it on a network filesystem whose file locking
+    SQLite can rely on; for real multi-host deployments a server-backed JobQueue
+    (e.g. Redis) is the better fit.
+    """
+
+    def __init__(self, path: Path, visibility_timeout: float = 300.0, max_attempts: int = 3,
+                 retry_delay: float = 5.0, clock: Callable[[], float] = time.time,
+                 journal_mode: str = "WAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+        if journal_mode.upper() not in ("WAL", "DELETE"):
+            raise ValueError(f"journal_mode must be 'WAL' or 'DELETE', got {journal_mode!r}")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+        self._conn.executescript(_SCHEMA)
+
+    @_locked
+    def close(self) -> None:
+        self._conn.close()
+
+    @_locked
+    def enqueue(self, payload: Dict[str, Any], job_id: Optional[str] = None,
+                max_attempts: Optional[int] = None) -> Optional[str]:
+        """Add a job; re-enqueueing an existing job_id is a no-op that returns None."""
+        job_id = job_id or str(uuid.uuid4())
+        now = self.clock()
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO jobs (id, payload, status, max_attempts, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(payload, ensure_ascii=False), QUEUED,
+             max_attempts or self.max_attempts, now, now, now),
+        )
+        return job_id if cur.rowcount == 1 else None
+
+    def _expire_leases(self, now: float) -> None:
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = 'visibility timeout exceeded', worker = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+            (DEAD, now, RUNNING, now),
+        )
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_until < ?",
+            (QUEUED, now, RUNNING, now),
+        )
+
+    @_locked
+    def claim(self, worker_id: str, visibility_timeout: Optional[float] = None) -> Optional[Job]:
+        vt = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        now = self.clock()
+        cur = self._conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire_leases(now)
+            row = cur.execute(
+                "SELECT id, payload, attempts, max_attempts FROM jobs "
+                "WHERE status = ? AND available_at <= ? ORDER BY created_at LIMIT 1",
+                (QUEUED, now),
+            ).fetchone()
+            if row is None:
+                cur.execute("COMMIT")
+                return None
+            job_id, payload, attempts, max_attempts = row
+            cur.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, now + vt, worker_id, now, job_id),
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        return {"id": job_id, "payload": json.loads(payload), "attempts": attempts + 1,
+                "max_attempts": max_attempts, "worker": worker_id}
+
+    @_locked
+    def _update_owned(self, sql: str, params: tuple, job_id: str, worker_id: str) -> bool:
+        # only the current lease holder may settle a job; a stale worker whose lease
+        # expired (and whose job was re-claimed) gets False back
+        cur = self._conn.execute(sql + " WHERE id = ? AND worker = ? AND status = ?",
+                                 params + (job_id, worker_id, RUNNING))
+        return cur.rowcount == 1
+
+    def ack(self, job_id: str, worker_id: str, result: Optional[Any] = None) -> bool:
+        now = self.clock()
+        return self._update_owned(
+            "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated_at = ?",
+            (DONE, json.dumps(result, ensure_ascii=False, default=str), now), job_id, worker_id,
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Record a failed attempt: retry after retry_delay, or dead-letter once attempts run out."""
+        now = self.clock()
+        return self._update_owned(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "available_at = ?, lease_until = NULL, error = ?, updated_at = ?",
+            (DEAD, QUEUED, now + self.retry_delay, error, now), job_id, worker_id,
+        )
+
+    def extend_lease(self, job_id: str, worker_id: str, visibility_timeout: Optional[float] = None) -> bool:
+        vt = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        now = self.clock()
+        return self._update_owned("UPDATE jobs SET lease_until = ?, updated_at = ?",
+                                  (now + vt, now), job_id, worker_id)
+
+    @_locked
+    def result(self, job_id: str) -> Optional[Any]:
+        row = self._conn.execute("SELECT result FROM jobs WHERE id = ? AND status = ?", (job_id, DONE)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    @_locked
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT id, payload, attempts, error FROM jobs WHERE status = ? ORDER BY updated_at", (DEAD,)
+        ).fetchall()
+        return [{"id": r[0], "payload": json.loads(r[1]), "attempts": r[2], "error": r[3]} for r in rows]
+
+    @_locked
+    def requeue_dead(self) -> int:
+        """Move dead-lettered jobs back to the queue with a fresh attempt budget."""
+        now = self.clock()
+        cur = self._conn.execute(
+            "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, error = NULL, updated_at = ? "
+            "WHERE status = ?",
+            (QUEUED, now, now, DEAD),
+        )
+        return cur.rowcount
+
+    @_locked
+    def stats(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, DEAD: 0}
+        for status, n in self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = n
+        return counts
@@ -0,0 +1,93 @@
+# src/distributed/worker.py
+from typing import Dict, Any, Iterable, Optional, Callable
+import logging
+import os
+import socket
+import threading
+import time
+from src.distributed.job_queue import JobQueue
+from src.graph.orchestrator import run_graph
+from src.utils.progress_journal import input_hash
+
+logger = logging.getLogger("agentic-graph")
+
+WriteFn = Callable[[Dict[str, Any]], Any]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_products(queue: JobQueue, products: Iterable[Dict[str, Any]]) -> int:
+    """
+    Producer side: one job per raw product, keyed by input hash so re-runs don't duplicate work.
+    Returns the number of jobs actually added (duplicates and already-queued inputs are skipped).
+    """
+    n = 0
+    for raw in products:
+        if queue.enqueue(raw, job_id=input_hash(raw)) is not None:
+            n += 1
+    return n
+
+
+def _heartbeat(queue: JobQueue, job_id: str, worker_id: str, interval: float, stop: threading.Event) -> None:
+    # renew the lease until the job is settled, so long runs aren't redelivered mid-flight
+    while not stop.wait(interval):
+        if not queue.extend_lease(job_id, worker_id):
+            logger.warning("Could not renew lease on job %s; another worker may own it", job_id[:12])
+            return
+
+
+def run_worker(queue: JobQueue, worker_id: Optional[str] = None, write_outputs: Optional[WriteFn] = None,
+               use_hybrid_qa: bool = False, poll_interval: float = 1.0, max_jobs: Optional[int] = None,
+               stop_when_empty: bool = False, heartbeat_interval: Optional[float] = None) -> Dict[str, int]:
+    """
+    Pull jobs from the queue, run the graph for each raw product and ack the result
+    (the run_id and whatever write_outputs returns). Exceptions fail the job, which
+    the queue retries or dead-letters. Runs forever unless max_jobs or stop_when_empty.
+    While a job runs, a heartbeat thread renews its lease every heartbeat_interval
+    seconds (default: a third of the queue's visibility_timeout).
+    """
+    worker_id = worker_id or default_worker_id()
+    if heartbeat_interval is None:
+        heartbeat_interval = queue.visibility_timeout / 3
+    summary = {"acked": 0, "failed": 0, "lost": 0}
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            if stop_when_empty:
+                stats = queue.stats()
+                if stats["queued"] == 0 and stats["running"] == 0:
+                    break
+            time.sleep(poll_interval)
+            continue
+
+        processed += 1
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(queue, job["id"], worker_id, heartbeat_interval, stop),
+                                     name=f"lease-{job['id'][:12]}", daemon=True)
+        heartbeat.start()
+        try:
+            final_state = run_graph(job["payload"], use_hybrid_qa=use_hybrid_qa)
+            output = write_outputs(final_state) if write_outputs is not None else None
+        except Exception as e:
+            stop.set()
+            heartbeat.join()
+            logger.exception("Job %s failed (attempt %d/%d)", job["id"][:12], job["attempts"], job["max_attempts"])
+            if queue.fail(job["id"], worker_id, repr(e)):
+                summary["failed"] += 1
+            else:
+                logger.warning("Lost lease on job %s before recording failure", job["id"][:12])
+                summary["lost"] += 1
+            continue
+        stop.set()
+        heartbeat.join()
+
+        if queue.ack(job["id"], worker_id, {"run_id": final_state.get("run_id"), "output": output}):
+            summary["acked"] += 1
+        else:
+            # lease expired and another worker owns the job now
+            logger.warning("Lost lease on job %s before ack", job["id"][:12])
+            summary["lost"] += 1
+    return summary
@@ -0,0 +1,73 @@
+# src/graph/batch_runner.py
+from typing import Dict, Any, Iterable, Optional, Callable, Sequence
+import logging
+from src.graph.orchestrator import compile_graph, initial_state
+from src.utils.progress_journal import ProgressJournal, input_hash, STARTED, CHECKPOINT, COMPLETED, FAILED
+
+logger = logging.getLogger("agentic-graph")
+
+# nodes whose output is worth persisting: QA is where (paid) LLM refinement happens
+DEFAULT_CHECKPOINT_NODES = ("qa",)
+
+WriteFn = Callable[[Dict[str, Any]], Any]
+
+
+def run_catalog(products: Iterable[Dict[str, Any]], journal: Optional[ProgressJournal] = None,
+                write_outputs: Optional[WriteFn] = None, resume: bool = False,
+                use_hybrid_qa: bool = False,
+                checkpoint_after: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """
+    Run the graph over many raw products, journaling each product's progress.
+    With resume=True, products already completed in the journal are skipped and
+    in-flight ones restart from their last checkpoint (or from scratch if none).
+    write_outputs receives the final state and returns the output location(s)
+    that get recorded in the journal.
+    """
+    graph = compile_graph(use_hybrid_qa=use_hybrid_qa)
+    if checkpoint_after is None:
+        checkpoint_after = DEFAULT_CHECKPOINT_NODES if use_hybrid_qa else ()
+    checkpoint_nodes = frozenset(checkpoint_after)
+    previous = journal.latest() if (journal is not None and resume) else {}
+    summary = {"completed": 0, "skipped": 0, "resumed": 0, "failed": 0}
+
+    for raw in products:
+        h = input_hash(raw)
+        last = previous.get(h)
+        if last is not None and last["status"] == COMPLETED:
+            summary["skipped"] += 1
+            continue
+
+        state, start_at = None, None
+        if last is not None and journal is not None:
+            checkpoint = journal.load_checkpoint(h)
+            if checkpoint is not None:
+                start_at, state = checkpoint
+                summary["resumed"] += 1
+        if state is None:
+            state = initial_state(raw)
+        run_id = state.get("run_id")
+
+        on_step = None
+        if journal is not None:
+            journal.record(h, run_id, STARTED, resumed_from=start_at)
+            if checkpoint_nodes:
+                def on_step(node, next_node, s, h=h, run_id=run_id):
+                    if node in checkpoint_nodes and next_node is not None:
+                        journal.save_checkpoint(h, next_node, s)
+                        journal.record(h, run_id, CHECKPOINT, node=node)
+
+        try:
+            final_state = graph.invoke(state, start_at=start_at, on_step=on_step)
+            output = write_outputs(final_state) if write_outputs is not None else None
+        except Exception as e:
+            logger.exception("Product %s failed", h[:12])
+            summary["failed"] += 1
+            if journal is not None:
+                journal.record(h, run_id, FAILED, error=repr(e))
+            continue
+
+        summary["completed"] += 1
+        if journal is not None:
+            journal.record(h, run_id, COMPLETED, output=output)
+            journal.clear_checkpoint(h)
+    return summary
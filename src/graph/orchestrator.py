@@ -1,7 +1,11 @@
 # src/graph/orchestrator.py
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import uuid
-from src.graph.state_graph import StateGraph
+from src.graph.state_graph import StateGraph, CompiledGraph
+from src.graph.pipeline import Stage, StagePipeline
+from src.utils.metrics import register_cache
 from src.state.schema import PipelineState
 from src.agents.parser_agent import ParserAgent
 from src.agents.qa_agent import QAGeneratorAgent
@@ -64,6 +68,8 @@ def build_graph(use_hybrid_qa: bool = False) -> StateGraph:
         "comparison": {"title":"Comparison - {{product.name}} vs Fictional", "sections":["ingredients_block"], "include_faq": False}
     })})
 
+    graph.set_start("parser")
+
     # linear edges
     graph.add_edge("parser", "qa")
     graph.add_edge("qa", "content")
@@ -78,16 +84,79 @@ def build_graph(use_hybrid_qa: bool = False) -> StateGraph:
             # loop back to 'qa' for revision
             return "qa"
 
-    graph.add_conditional_edge("critique", critique_decision)
+    graph.add_conditional_edge("critique", critique_decision, targets=("comparison", "qa"))
 
     graph.add_edge("comparison", "assembler")
     graph.set_end("assembler")
 
     return graph
 
+@lru_cache(maxsize=None)
+def compile_graph(use_hybrid_qa: bool = False) -> CompiledGraph:
+    """Build and validate the pipeline graph once; the plan is reused across runs."""
+    return build_graph(use_hybrid_qa=use_hybrid_qa).compile()
+
+
+register_cache("graph_plan", lambda: compile_graph.cache_info().hits, lambda: compile_graph.cache_info().misses)
+
+
+def initial_state(raw_input: Dict[str, Any]) -> PipelineState:
+    return {"raw_input": raw_input, "run_id": str(uuid.uuid4()), "approved": False}
+
+
 def run_graph(raw_input: Dict[str, Any], dry_run: bool = False, use_hybrid_qa: bool = False) -> Dict[str, Any]:
-    graph = build_graph(use_hybrid_qa=use_hybrid_qa)
-    initial_state: PipelineState = {"raw_input": raw_input, "run_id": str(uuid.uuid4()), "approved": False}
-    final_state = graph.invoke(initial_state)
+    graph = compile_graph(use_hybrid_qa=use_hybrid_qa)
+    final_state = graph.invoke(initial_state(raw_input))
     # optionally write outputs here or return final_state
     return final_state
+
+
+async def arun_graph(raw_input: Dict[str, Any], use_hybrid_qa: bool = False) -> Dict[str, Any]:
+    graph = compile_graph(use_hybrid_qa=use_hybrid_qa)
+    return await graph.ainvoke(initial_state(raw_input))
+
+
+async def arun_graph_many(raw_inputs: Iterable[Dict[str, Any]], concurrency: int = 100,
+                          use_hybrid_qa: bool = False, max_threads: Optional[int] = None,
+                          return_exceptions: bool = False) -> List[Any]:
+    """
+    Run many products in one event loop. No agent has an async path yet (hybrid LLM QA
+    included), so every node runs on a dedicated thread pool and each product in
+    flight holds a thread while it runs: concurrency is bounded by max_threads, not
+    by the event loop. Async nodes added later are awaited without a thread.
+    """
+    graph = compile_graph(use_hybrid_qa=use_hybrid_qa)
+    with ThreadPoolExecutor(max_workers=max_threads or concurrency) as executor:
+        return await graph.ainvoke_many((initial_state(raw) for raw in raw_inputs), concurrency=concurrency,
+                                        executor=executor, return_exceptions=return_exceptions)
+
+
+# (stage name, first node, node the stage stops before); the qa stage keeps the whole
+# qa -> content -> critique revision loop so conditional edges behave as in invoke()
+PIPELINE_STAGES = (("parse", "parser", "qa"), ("qa", "qa", "comparison"), ("assemble", "comparison", None))
+
+
+def build_stage_pipeline(use_hybrid_qa: bool = False, write_outputs: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                         workers: Optional[Dict[str, int]] = None, queue_size: int = 64) -> StagePipeline:
+    """
+    Streaming pipeline over raw products: parse -> qa (with critique loop) -> assemble
+    [-> write]. workers maps stage name to thread count, e.g. {"qa": 16, "write": 4}.
+    The pipeline yields final states, or (state, write_outputs(state)) pairs when
+    write_outputs is given.
+    """
+    graph = compile_graph(use_hybrid_qa=use_hybrid_qa)
+    workers = workers or {}
+
+    def segment(start: str, stop: Optional[str]):
+        if start == graph.start_node:
+            return lambda raw: graph.invoke(initial_state(raw), stop_at=stop)
+        return lambda state: graph.invoke(state, start_at=start, stop_at=stop)
+
+    stages = [Stage(name, segment(start, stop), workers=workers.get(name, 1))
+              for name, start, stop in PIPELINE_STAGES]
+    if write_outputs is not None:
+        stages.append(Stage("write", lambda state: (state, write_outputs(state)), workers=workers.get("write", 1)))
+    unknown = set(workers) - {s.name for s in stages}
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {', '.join(sorted(unknown))}")
+    return StagePipeline(stages, queue_size=queue_size)
@@ -0,0 +1,200 @@
+# src/graph/pipeline.py
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Sequence
+import queue
+import threading
+import time
+from src.utils.metrics import REGISTRY
+
+STAGE_LATENCY = REGISTRY.histogram("pipeline_stage_duration_seconds", "Time one item spends in a stage function.",
+                                   labels=("stage",))
+STAGE_QUEUE_DEPTH = REGISTRY.gauge("pipeline_stage_queue_depth", "Items waiting in a stage's input queue.",
+                                   labels=("stage",))
+STAGE_UTILIZATION = REGISTRY.gauge("pipeline_stage_utilization",
+                                   "Busy time / (workers * wall time) for a stage in the current run.",
+                                   labels=("stage",))
+
+_DONE = object()
+_POLL = 0.1
+
+
+class Stage:
+    """One step of a StagePipeline: fn(item) -> item, run by `workers` threads."""
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, queue_size: Optional[int] = None):
+        if workers < 1:
+            raise ValueError(f"Stage {name!r} needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class StageFailure:
+    """Emitted in place of a result when a stage raised; later stages pass it through untouched."""
+
+    def __init__(self, stage: str, item: Any, error: BaseException):
+        self.stage = stage
+        self.item = item
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"StageFailure(stage={self.stage!r}, error={self.error!r})"
+
+
+class _StageRuntime:
+    def __init__(self, stage: Stage, default_queue_size: int):
+        self.stage = stage
+        self.inbox: "queue.Queue[Any]" = queue.Queue(maxsize=stage.queue_size or default_queue_size)
+        self.lock = threading.Lock()
+        self.live_workers = stage.workers
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.gets = 0
+
+    def record(self, depth: int, busy: float, failed: bool) -> None:
+        with self.lock:
+            self.processed += 1
+            self.failed += failed
+            self.busy += busy
+            self.depth_sum += depth
+            self.depth_max = max(self.depth_max, depth)
+            self.gets += 1
+
+
+class StagePipeline:
+    """
+    Streams items through stages that run concurrently, each with its own worker
+    threads, connected by bounded queues. A slow stage fills its input queue, which
+    blocks the stage before it and eventually the feeder, so memory stays bounded by
+    the queue sizes no matter how large the input is.
+
+    Workers are threads: this overlaps I/O-bound stages (LLM calls, disk writes)
+    with cheap CPU stages; it does not parallelize CPU-bound Python code.
+    Results are yielded in completion order.
+    """
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = 64):
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage")
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self._runtimes: List[_StageRuntime] = []
+        self._started = 0.0
+        self._finished: Optional[float] = None
+        self._stop = threading.Event()
+        self._feed_error: Optional[BaseException] = None
+
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self, rt: _StageRuntime, outbox: "queue.Queue[Any]", next_workers: int) -> None:
+        fn, name = rt.stage.fn, rt.stage.name
+        latency = STAGE_LATENCY.labels(stage=name)
+        while not self._stop.is_set():
+            try:
+                item = rt.inbox.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            depth = rt.inbox.qsize()
+            t0 = time.perf_counter()
+            failed = False
+            if not isinstance(item, StageFailure):
+                try:
+                    item = fn(item)
+                except Exception as e:
+                    item = StageFailure(name, item, e)
+                    failed = True
+            busy = time.perf_counter() - t0
+            latency.observe(busy)
+            rt.record(depth, busy, failed)
+            if not self._put(outbox, item):
+                return
+        with rt.lock:
+            rt.live_workers -= 1
+            last = rt.live_workers == 0
+        if last:
+            # the last worker of a stage closes the next stage's queue
+            for _ in range(next_workers):
+                self._put(outbox, _DONE)
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Feed items through all stages and yield final results (or StageFailure)."""
+        self._stop.clear()
+        self._feed_error = None
+        self._runtimes = [_StageRuntime(s, self.queue_size) for s in self.stages]
+        results: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        self._started = time.perf_counter()
+        self._finished = None
+        for rt in self._runtimes:
+            STAGE_QUEUE_DEPTH.labels(stage=rt.stage.name).set_function(rt.inbox.qsize)
+
+        threads = []
+        for i, rt in enumerate(self._runtimes):
+            if i + 1 < len(self._runtimes):
+                outbox, next_workers = self._runtimes[i + 1].inbox, self._runtimes[i + 1].stage.workers
+            else:
+                outbox, next_workers = results, 1
+            for w in range(rt.stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(rt, outbox, next_workers),
+                                                name=f"stage-{rt.stage.name}-{w}", daemon=True))
+
+        first = self._runtimes[0]
+
+        def feed():
+            try:
+                for item in items:
+                    if not self._put(first.inbox, item):
+                        return
+            except Exception as e:
+                self._feed_error = e
+            for _ in range(first.stage.workers):
+                self._put(first.inbox, _DONE)
+
+        threads.append(threading.Thread(target=feed, name="stage-feeder", daemon=True))
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+            if self._feed_error is not None:
+                raise self._feed_error
+        finally:
+            # also reached when the caller stops iterating early
+            self._stop.set()
+            for t in threads:
+                t.join()
+            self._finished = time.perf_counter()
+            for name, s in self.stats().items():
+                STAGE_UTILIZATION.labels(stage=name).set(s["utilization"])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage processed/failed counts, queue depth (current/mean/max) and utilization."""
+        elapsed = ((self._finished or time.perf_counter()) - self._started) or 1e-9
+        out = {}
+        for rt in self._runtimes:
+            with rt.lock:
+                out[rt.stage.name] = {
+                    "workers": rt.stage.workers,
+                    "processed": rt.processed,
+                    "failed": rt.failed,
+                    "queue_depth": rt.inbox.qsize(),
+                    "queue_depth_mean": rt.depth_sum / rt.gets if rt.gets else 0.0,
+                    "queue_depth_max": rt.depth_max,
+                    "queue_capacity": rt.inbox.maxsize,
+                    "utilization": min(1.0, rt.busy / (rt.stage.workers * elapsed)),
+                }
+        return out
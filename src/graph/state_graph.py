@@ -1,54 +1,403 @@
 # src/graph/state_graph.py
-from typing import Callable, Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, Optional, Tuple, Iterable, FrozenSet, List
+from concurrent.futures import Executor
+import asyncio
+import functools
+import inspect
+import time
+from src.utils.metrics import REGISTRY
 
+# a node may also be an async function (only runnable via ainvoke)
 NodeFn = Callable[[Dict[str, Any]], Dict[str, Any]]
+DecisionFn = Callable[[Dict[str, Any]], str]
+# called after each node with (node, next_node or None, state)
+StepFn = Callable[[str, Optional[str], Dict[str, Any]], None]
+
+DEFAULT_MAX_STEPS = 200
+
+NODE_LATENCY = REGISTRY.histogram("graph_node_duration_seconds", "Time spent executing a graph node.",
+                                  labels=("node",))
+NODE_VISITS = REGISTRY.histogram("graph_node_visits_per_run",
+                                 "Times a node ran within one invocation (loop iterations, e.g. critique).",
+                                 labels=("node",), buckets=(1, 2, 3, 5, 10, 25, 50, 100, 200))
+GRAPH_RUNS = REGISTRY.counter("graph_runs_total",
+                              "Graph runs by outcome; a run split into stop_at segments counts once.",
+                              labels=("outcome",))
+
+
+class GraphValidationError(ValueError):
+    """Raised by StateGraph.compile() when the graph cannot be turned into a plan."""
+
 
 class StateGraph:
     def __init__(self) -> None:
         self.nodes: Dict[str, NodeFn] = {}
         self.edges: Dict[str, str] = {}  # simple linear edge (node -> next_node)
         self.conditional_edges: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+        # optional declared targets of a conditional edge (used for static validation)
+        self.conditional_targets: Dict[str, Tuple[str, ...]] = {}
         self.start_node: Optional[str] = None
         self.end_nodes = set()
 
     def add_node(self, name: str, fn: NodeFn) -> None:
         self.nodes[name] = fn
-        if self.start_node is None:
-            self.start_node = name
+
+    def set_start(self, node: str) -> None:
+        self.start_node = node
 
     def add_edge(self, src: str, dst: str) -> None:
         self.edges[src] = dst
 
-    def add_conditional_edge(self, src: str, decision_fn: Callable[[Dict[str, Any]], str]) -> None:
+    def add_conditional_edge(self, src: str, decision_fn: DecisionFn,
+                             targets: Optional[Iterable[str]] = None) -> None:
         """
         decision_fn returns the name of the next node to execute given the state.
+        targets optionally declares every name decision_fn may return, so compile()
+        can check reachability, reject unknown targets and detect loops that can never
+        reach an end node before running.
         """
         self.conditional_edges[src] = decision_fn
+        if targets is not None:
+            self.conditional_targets[src] = tuple(targets)
+        else:
+            self.conditional_targets.pop(src, None)
 
     def set_end(self, node: str) -> None:
         self.end_nodes.add(node)
 
-    def invoke(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+    def compile(self, max_steps: int = DEFAULT_MAX_STEPS) -> "CompiledGraph":
+        """
+        Validate the graph and freeze it into a CompiledGraph.
+        Raises GraphValidationError for a missing start node, edges to unknown nodes,
+        unreachable nodes and cycles that have no conditional exit.
+        """
         if not self.start_node:
-            raise RuntimeError("No start node defined")
-        state = dict(initial_state)
-        current = self.start_node
-        visited = 0
-        # note: add simple safety to avoid infinite loops
-        while current is not None:
-            visited += 1
-            if visited > 200:
-                raise RuntimeError("Graph invoked too many steps (possible infinite loop)")
-            if current not in self.nodes:
-                raise RuntimeError(f"Node not found: {current}")
-            node_fn = self.nodes[current]
-            state = node_fn(state) or state
-            # conditional?
-            if current in self.conditional_edges:
-                next_node = self.conditional_edges[current](state)
-            else:
-                next_node = self.edges.get(current)
-            if next_node is None or next_node in self.end_nodes:
-                break
-            current = next_node
+            raise GraphValidationError("No start node defined (call set_start())")
+        if self.start_node not in self.nodes:
+            raise GraphValidationError(f"Start node not found: {self.start_node}")
+        if max_steps < 1:
+            raise GraphValidationError("max_steps must be >= 1")
+
+        for src, dst in self.edges.items():
+            if src not in self.nodes:
+                raise GraphValidationError(f"Edge from unknown node: {src} -> {dst}")
+            if src in self.conditional_edges:
+                raise GraphValidationError(f"Node has both a static and a conditional edge: {src}")
+            if dst not in self.nodes:
+                raise GraphValidationError(f"Edge to unknown node: {src} -> {dst}")
+        for src in self.conditional_edges:
+            if src not in self.nodes:
+                raise GraphValidationError(f"Conditional edge from unknown node: {src}")
+            for dst in self.conditional_targets.get(src, ()):
+                if dst not in self.nodes:
+                    raise GraphValidationError(f"Conditional edge to unknown node: {src} -> {dst}")
+        for end in self.end_nodes:
+            if end not in self.nodes:
+                raise GraphValidationError(f"End node not found: {end}")
+
+        self._check_reachability()
+        self._check_static_cycles()
+        self._check_exits()
+        return CompiledGraph(self, max_steps)
+
+    def _successors(self, node: str) -> Tuple[str, ...]:
+        if node in self.conditional_edges:
+            # an undeclared decision function may route anywhere
+            return self.conditional_targets.get(node, tuple(self.nodes))
+        nxt = self.edges.get(node)
+        return (nxt,) if nxt is not None else ()
+
+    def _check_reachability(self) -> None:
+        seen = {self.start_node}
+        stack = [self.start_node]
+        while stack:
+            node = stack.pop()
+            if node in self.end_nodes and node != self.start_node:
+                # execution stops on reaching an end node
+                continue
+            for nxt in self._successors(node):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        unreachable = [n for n in self.nodes if n not in seen]
+        if unreachable:
+            raise GraphValidationError(f"Unreachable nodes: {', '.join(sorted(unreachable))}")
+
+    def _check_static_cycles(self) -> None:
+        # a cycle made only of static edges, with no end node on it, can never exit
+        for start in self.nodes:
+            path: List[str] = []
+            on_path = set()
+            node: Optional[str] = start
+            while node is not None and node not in self.conditional_edges and node not in on_path:
+                path.append(node)
+                on_path.add(node)
+                nxt = self.edges.get(node)
+                if nxt is not None and nxt in self.end_nodes:
+                    node = None
+                else:
+                    node = nxt
+            if node is not None and node in on_path:
+                cycle = path[path.index(node):] + [node]
+                raise GraphValidationError(f"Cycle without exit condition: {' -> '.join(cycle)}")
+
+    def _check_exits(self) -> None:
+        # every executed node must be able to reach a terminal node or an end node;
+        # declared conditional targets are taken as the complete set of choices, while
+        # an undeclared decision function is assumed to be able to stop the run
+        can_exit = set()
+        for node in self.nodes:
+            if node in self.conditional_edges:
+                if node not in self.conditional_targets:
+                    can_exit.add(node)
+            elif self.edges.get(node) is None:
+                can_exit.add(node)
+        changed = True
+        while changed:
+            changed = False
+            for node in self.nodes:
+                if node in can_exit:
+                    continue
+                if any(n in self.end_nodes or n in can_exit for n in self._successors(node)):
+                    can_exit.add(node)
+                    changed = True
+
+        executed = {self.start_node}
+        stack = [self.start_node]
+        while stack:
+            for nxt in self._successors(stack.pop()):
+                if nxt not in executed and nxt not in self.end_nodes:
+                    executed.add(nxt)
+                    stack.append(nxt)
+        trapped = [n for n in self.nodes if n in executed and n not in can_exit]
+        if trapped:
+            raise GraphValidationError(
+                f"Cycle without exit condition: no end node reachable from {', '.join(sorted(trapped))}"
+            )
+
+    def invoke(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+        return self.compile().invoke(initial_state)
+
+    async def ainvoke(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.compile().ainvoke(initial_state)
+
+
+class CompiledGraph:
+    """
+    Immutable execution plan produced by StateGraph.compile().
+    Node names are resolved to indices once, so invoke() only follows precomputed
+    successors; build it once and reuse it across a batch of products.
+    ainvoke()/ainvoke_many() run the same plan on an event loop.
+    """
+
+    __slots__ = ("_names", "_fns", "_is_async", "_static_next", "_decisions", "_allowed", "_index", "_start",
+                 "_end", "_latency", "_visits", "max_steps")
+
+    _NO_NEXT = -1
+
+    def __init__(self, graph: StateGraph, max_steps: int) -> None:
+        names = tuple(graph.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        object.__setattr__(self, "_names", names)
+        object.__setattr__(self, "_fns", tuple(graph.nodes[n] for n in names))
+        object.__setattr__(self, "_is_async", tuple(inspect.iscoroutinefunction(graph.nodes[n]) for n in names))
+        object.__setattr__(self, "_static_next", tuple(
+            index[graph.edges[n]] if n in graph.edges else self._NO_NEXT for n in names
+        ))
+        object.__setattr__(self, "_decisions", tuple(graph.conditional_edges.get(n) for n in names))
+        object.__setattr__(self, "_allowed", tuple(
+            frozenset(index[t] for t in graph.conditional_targets[n]) if n in graph.conditional_targets else None
+            for n in names
+        ))
+        object.__setattr__(self, "_index", index)
+        object.__setattr__(self, "_start", index[graph.start_node])
+        object.__setattr__(self, "_end", frozenset(index[n] for n in graph.end_nodes))
+        object.__setattr__(self, "_latency", tuple(NODE_LATENCY.labels(node=n) for n in names))
+        object.__setattr__(self, "_visits", tuple(NODE_VISITS.labels(node=n) for n in names))
+        object.__setattr__(self, "max_steps", max_steps)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledGraph is immutable")
+
+    @property
+    def node_names(self) -> Tuple[str, ...]:
+        return self._names
+
+    @property
+    def start_node(self) -> str:
+        return self._names[self._start]
+
+    @property
+    def end_nodes(self) -> FrozenSet[str]:
+        return frozenset(self._names[i] for i in self._end)
+
+    def next_node(self, node: str) -> Optional[str]:
+        """Static successor of node, or None when it ends or routes conditionally."""
+        nxt = self._static_next[self._index[node]]
+        return None if nxt == self._NO_NEXT else self._names[nxt]
+
+    def _resolve(self, src: int, target: Optional[str]) -> int:
+        if target is None:
+            return self._NO_NEXT
+        nxt = self._index.get(target, self._NO_NEXT)
+        allowed = self._allowed[src]
+        if nxt == self._NO_NEXT or (allowed is not None and nxt not in allowed):
+            raise RuntimeError(f"Node not found: {target} (returned by {self._names[src]})")
+        return nxt
+
+    def _entry(self, start_at: Optional[str]) -> int:
+        if start_at is None:
+            return self._start
+        if start_at in self._index:
+            return self._index[start_at]
+        raise RuntimeError(f"Node not found: {start_at}")
+
+    def _stop(self, stop_at: Optional[str]) -> int:
+        return self._NO_NEXT if stop_at is None else self._entry(stop_at)
+
+    def _observe_visits(self, visits: List[int]) -> None:
+        for i, n in enumerate(visits):
+            if n:
+                self._visits[i].observe(n)
+
+    def invoke(self, initial_state: Dict[str, Any], start_at: Optional[str] = None,
+               on_step: Optional[StepFn] = None, stop_at: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run the plan. start_at resumes from a given node (e.g. a checkpoint) instead of
+        the start node; stop_at returns the state just before that node would run, so a
+        plan can be executed in segments (only the segment without stop_at counts as a
+        completed run in graph_runs_total); on_step, if given, is called after every
+        executed node.
+        """
+        if any(self._is_async):
+            async_nodes = [n for n, a in zip(self._names, self._is_async) if a]
+            raise RuntimeError(f"Graph has async nodes ({', '.join(async_nodes)}); use ainvoke()")
+        current = self._entry(start_at)
+        visits = [0] * len(self._names)
+        try:
+            state = self._run(dict(initial_state), current, on_step, visits, self._stop(stop_at))
+        except Exception:
+            GRAPH_RUNS.labels(outcome="error").inc()
+            raise
+        finally:
+            self._observe_visits(visits)
+        if stop_at is None:
+            # a stop_at segment is continued by a later invoke; count the run when it completes
+            GRAPH_RUNS.labels(outcome="ok").inc()
         return state
+
+    async def ainvoke(self, initial_state: Dict[str, Any], start_at: Optional[str] = None,
+                      on_step: Optional[StepFn] = None, executor: Optional[Executor] = None,
+                      stop_at: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async counterpart of invoke() with the same edge and loop-guard semantics.
+        Async nodes are awaited; sync nodes run in executor (the loop's default if None)
+        so they don't block other products in flight, and an awaitable they return is
+        awaited on the loop. Decision functions and on_step
+        run inline and may also be coroutines.
+        """
+        current = self._entry(start_at)
+        visits = [0] * len(self._names)
+        try:
+            state = await self._arun(dict(initial_state), current, on_step, visits, executor, self._stop(stop_at))
+        except Exception:
+            GRAPH_RUNS.labels(outcome="error").inc()
+            raise
+        finally:
+            self._observe_visits(visits)
+        if stop_at is None:
+            # a stop_at segment is continued by a later invoke; count the run when it completes
+            GRAPH_RUNS.labels(outcome="ok").inc()
+        return state
+
+    async def ainvoke_many(self, initial_states: Iterable[Dict[str, Any]], concurrency: int = 100,
+                           executor: Optional[Executor] = None,
+                           return_exceptions: bool = False) -> List[Any]:
+        """
+        Run many states with at most `concurrency` in flight; results keep input order.
+        With return_exceptions=True a failed run yields its exception instead of
+        cancelling the rest.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        pending = iter(enumerate(initial_states))
+        results: Dict[int, Any] = {}
+
+        async def worker():
+            for i, state in pending:
+                try:
+                    results[i] = await self.ainvoke(state, executor=executor)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[i] = e
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            raise
+        return [results[i] for i in range(len(results))]
+
+    def _run(self, state: Dict[str, Any], current: int, on_step: Optional[StepFn],
+             visits: List[int], stop: int) -> Dict[str, Any]:
+        fns, static_next, decisions, end = self._fns, self._static_next, self._decisions, self._end
+        names, latency = self._names, self._latency
+        for _ in range(self.max_steps):
+            visits[current] += 1
+            t0 = time.perf_counter()
+            result = fns[current](state)
+            if inspect.isawaitable(result):
+                # e.g. a sync wrapper or functools.partial around a coroutine function
+                if inspect.iscoroutine(result):
+                    result.close()
+                raise RuntimeError(f"Node {names[current]!r} returned an awaitable; use ainvoke()")
+            state = result or state
+            latency[current].observe(time.perf_counter() - t0)
+            decide = decisions[current]
+            nxt = self._resolve(current, decide(state)) if decide is not None else static_next[current]
+            done = nxt == self._NO_NEXT or nxt in end or nxt == stop
+            if on_step is not None:
+                on_step(names[current], None if done else names[nxt], state)
+            if done:
+                return state
+            current = nxt
+        raise RuntimeError(f"Graph invoked too many steps (> {self.max_steps}, possible infinite loop)")
+
+    async def _arun(self, state: Dict[str, Any], current: int, on_step: Optional[StepFn],
+                    visits: List[int], executor: Optional[Executor], stop: int) -> Dict[str, Any]:
+        fns, is_async, static_next, decisions, end = (self._fns, self._is_async, self._static_next,
+                                                      self._decisions, self._end)
+        names, latency = self._names, self._latency
+        loop = asyncio.get_running_loop()
+        for _ in range(self.max_steps):
+            visits[current] += 1
+            t0 = time.perf_counter()
+            if is_async[current]:
+                result = await fns[current](state)
+            else:
+                result = await loop.run_in_executor(executor, functools.partial(fns[current], state))
+                if inspect.isawaitable(result):
+                    # not detectable at compile time (wrappers, partials); await on the loop
+                    result = await result
+            state = result or state
+            latency[current].observe(time.perf_counter() - t0)
+            decide = decisions[current]
+            if decide is not None:
+                target = decide(state)
+                if inspect.isawaitable(target):
+                    target = await target
+                nxt = self._resolve(current, target)
+            else:
+                nxt = static_next[current]
+            done = nxt == self._NO_NEXT or nxt in end or nxt == stop
+            if on_step is not None:
+                ret = on_step(names[current], None if done else names[nxt], state)
+                if inspect.isawaitable(ret):
+                    await ret
+            if done:
+                return state
+            current = nxt
+        raise RuntimeError(f"Graph invoked too many steps (> {self.max_steps}, possible infinite loop)")
@@ -5,6 +5,13 @@ import argparse
 import logging
 from pathlib import Path
 from src.graph.orchestrator import run_graph
+from src.graph.batch_runner import run_catalog
+from src.graph.orchestrator import build_stage_pipeline, PIPELINE_STAGES
+from src.graph.pipeline import StageFailure
+from src.utils.progress_journal import ProgressJournal
+from src.distributed.job_queue import SQLiteJobQueue
+from src.distributed.worker import enqueue_products, run_worker
+from src.utils.metrics import REGISTRY, write_metrics_file, serve_metrics
 
 ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = ROOT / "outputs"
@@ -12,13 +19,70 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 
 logger = logging.getLogger("agentic-graph")
 
+OUTPUT_FILES = REGISTRY.counter("output_files_written_total", "Output JSON files written.")
+OUTPUT_BYTES = REGISTRY.counter("output_bytes_written_total", "Bytes of output JSON written.")
+OUTPUT_LATENCY = REGISTRY.histogram("output_write_seconds", "Time to serialize and write one output file.")
+
 
 def parse_args(argv=None):
     p = argparse.ArgumentParser()
     p.add_argument("--dry-run", action="store_true")
     p.add_argument("--debug", action="store_true")
     p.add_argument("--enable-llm", action="store_true", help="enable hybrid LLM QA (requires OPENAI_API_KEY)")
-    return p.parse_args(argv)
+    p.add_argument("--input", type=Path, help="JSON list or JSONL file of raw products to run as a batch")
+    p.add_argument("--journal", type=Path, default=OUTPUT_DIR / "progress_journal.jsonl",
+                   help="append-only progress journal used for batch runs")
+    p.add_argument("--resume", action="store_true",
+                   help="skip products completed in the journal and resume in-flight ones from checkpoints")
+    p.add_argument("--queue", type=Path,
+                   help="SQLite job queue file; with --input, enqueue products instead of running them")
+    p.add_argument("--worker", action="store_true", help="pull and run jobs from --queue until it is drained")
+    p.add_argument("--visibility-timeout", type=float, default=300.0,
+                   help="seconds a claimed job stays invisible to other workers")
+    p.add_argument("--queue-journal-mode", choices=("WAL", "DELETE"), default="WAL",
+                   help="SQLite journal mode for --queue: WAL for workers on one host, "
+                        "DELETE when the queue file is shared between hosts")
+    p.add_argument("--pipeline", action="store_true",
+                   help="with --input, stream products through concurrent stages connected by bounded queues")
+    p.add_argument("--stage-workers", default="",
+                   help="per-stage worker threads for --pipeline, e.g. 'qa=8,write=2' (stages: parse, qa, assemble, write)")
+    p.add_argument("--metrics-file", type=Path, help="write Prometheus text metrics here when the run ends")
+    p.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on http://0.0.0.0:<port>/metrics")
+    args = p.parse_args(argv)
+
+    if args.resume and args.dry_run:
+        # dry runs don't touch the journal, so there would be nothing to resume from
+        p.error("--resume cannot be combined with --dry-run")
+    if args.pipeline and not args.input:
+        p.error("--pipeline requires --input")
+    if args.worker and not args.queue:
+        p.error("--worker requires --queue")
+    if args.queue and not (args.input or args.worker):
+        p.error("--queue needs --input (enqueue) and/or --worker (process jobs)")
+    try:
+        args.stage_workers = parse_stage_workers(args.stage_workers)
+    except ValueError as e:
+        p.error(f"--stage-workers: {e}")
+    return args
+
+
+def parse_stage_workers(spec: str):
+    """'qa=8,write=2' -> {"qa": 8, "write": 2}; raises ValueError on malformed parts or unknown stages."""
+    stages = [name for name, _, _ in PIPELINE_STAGES] + ["write"]
+    workers = {}
+    for part in filter(None, (s.strip() for s in spec.split(","))):
+        name, sep, n = part.partition("=")
+        name = name.strip()
+        if name not in stages:
+            raise ValueError(f"unknown stage {name!r} (stages: {', '.join(stages)})")
+        try:
+            count = int(n) if sep else 0
+        except ValueError:
+            count = 0
+        if count < 1:
+            raise ValueError(f"expected {name}=<workers> with a positive integer, got {part!r}")
+        workers[name] = count
+    return workers
 
 
 def configure_logging(debug=False):
@@ -28,34 +92,30 @@ def configure_logging(debug=False):
 
 def write_json(path: Path, data, *, ensure_ascii=False):
     import json
+    import time
+    t0 = time.perf_counter()
     tmp = path.with_suffix(path.suffix + ".tmp")
     with tmp.open("w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=ensure_ascii)
+        size = f.tell()
     tmp.replace(path)
+    OUTPUT_LATENCY.observe(time.perf_counter() - t0)
+    OUTPUT_FILES.inc()
+    OUTPUT_BYTES.inc(size)
 
 
-def main():
-    args = parse_args()
-    configure_logging(args.debug)
-
-    use_hybrid = args.enable_llm and bool(os.getenv("OPENAI_API_KEY"))
-
-    # sample input (assignment example)
-    raw_product = {
-        "Product Name": "GlowBoost Vitamin C Serum",
-        "Concentration": "10% Vitamin C",
-        "Skin Type": "Oily, Combination",
-        "Key Ingredients": "Vitamin C, Hyaluronic Acid",
-        "Benefits": "Brightening, Fades dark spots",
-        "How to Use": "Apply 2–3 drops in the morning before sunscreen",
-        "Side Effects": "Mild tingling for sensitive skin",
-        "Price": "₹699"
-    }
+def load_products(path: Path):
+    import json
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    data = json.loads(text)
+    return data if isinstance(data, list) else [data]
 
-    final_state = run_graph(raw_product, dry_run=args.dry_run, use_hybrid_qa=use_hybrid)
 
+def build_faq(final_state):
     # -----------------------------
-    # NEW: SAFE PRODUCT NAME EXTRACTION
+    # SAFE PRODUCT NAME EXTRACTION
     # -----------------------------
     product = final_state.get("product")
 
@@ -73,22 +133,127 @@ def main():
         or "Unknown Product"
     )
 
-    # Construct FAQ output safely
-    faq = {
+    return {
         "title": f"FAQ - {product_name}",
         "faq": final_state.get("qa_pairs", [])
     }
 
-    # Write outputs if not dry-run
-    if not args.dry_run:
-        import time
-        ts = final_state.get("run_id") or str(time.time())
 
-        draft = final_state.get("draft_page")
-        if draft:
-            write_json(OUTPUT_DIR / f"product_page_{ts}.json", draft, ensure_ascii=False)
+def write_outputs(final_state):
+    """Write the product page and FAQ for a final state; returns the written paths."""
+    import time
+    ts = final_state.get("run_id") or str(time.time())
+
+    written = []
+    draft = final_state.get("draft_page")
+    if draft:
+        path = OUTPUT_DIR / f"product_page_{ts}.json"
+        write_json(path, draft, ensure_ascii=False)
+        written.append(str(path))
+
+    path = OUTPUT_DIR / f"faq_{ts}.json"
+    write_json(path, build_faq(final_state), ensure_ascii=False)
+    written.append(str(path))
+    return written
+
 
-        write_json(OUTPUT_DIR / f"faq_{ts}.json", faq, ensure_ascii=False)
+def run_batch(args, use_hybrid: bool):
+    products = load_products(args.input)
+    journal = None if args.dry_run else ProgressJournal(args.journal)
+    summary = run_catalog(
+        products,
+        journal=journal,
+        write_outputs=None if args.dry_run else write_outputs,
+        resume=args.resume,
+        use_hybrid_qa=use_hybrid,
+    )
+    print("Batch run complete:", summary)
+
+
+def run_pipeline(args, use_hybrid: bool):
+    pipeline = build_stage_pipeline(
+        use_hybrid_qa=use_hybrid,
+        write_outputs=None if args.dry_run else write_outputs,
+        workers=args.stage_workers,
+    )
+    completed = failed = 0
+    for result in pipeline.run(load_products(args.input)):
+        if isinstance(result, StageFailure):
+            logger.error("Product failed in stage %s: %r", result.stage, result.error)
+            failed += 1
+        else:
+            completed += 1
+    print(f"Pipeline run complete: completed={completed} failed={failed}")
+    for name, s in pipeline.stats().items():
+        print(f"  {name:<9} workers={s['workers']} processed={s['processed']} "
+              f"queue_depth_mean={s['queue_depth_mean']:.1f} queue_depth_max={s['queue_depth_max']} "
+              f"utilization={s['utilization']:.0%}")
+
+
+def run_distributed(args, use_hybrid: bool):
+    queue = SQLiteJobQueue(args.queue, visibility_timeout=args.visibility_timeout,
+                           journal_mode=args.queue_journal_mode)
+    try:
+        if args.input:
+            n = enqueue_products(queue, load_products(args.input))
+            print(f"Enqueued {n} new products:", queue.stats())
+        if args.worker:
+            summary = run_worker(
+                queue,
+                write_outputs=None if args.dry_run else write_outputs,
+                use_hybrid_qa=use_hybrid,
+                stop_when_empty=True,
+            )
+            print("Worker finished:", summary, queue.stats())
+    finally:
+        queue.close()
+
+
+def main():
+    args = parse_args()
+    configure_logging(args.debug)
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    try:
+        run(args)
+    finally:
+        if args.metrics_file:
+            write_metrics_file(args.metrics_file)
+
+
+def run(args):
+    use_hybrid = args.enable_llm and bool(os.getenv("OPENAI_API_KEY"))
+
+    if args.queue:
+        run_distributed(args, use_hybrid)
+        return
+
+    if args.input and args.pipeline:
+        run_pipeline(args, use_hybrid)
+        return
+
+    if args.input:
+        run_batch(args, use_hybrid)
+        return
+
+    # sample input (assignment example)
+    raw_product = {
+        "Product Name": "GlowBoost Vitamin C Serum",
+        "Concentration": "10% Vitamin C",
+        "Skin Type": "Oily, Combination",
+        "Key Ingredients": "Vitamin C, Hyaluronic Acid",
+        "Benefits": "Brightening, Fades dark spots",
+        "How to Use": "Apply 2–3 drops in the morning before sunscreen",
+        "Side Effects": "Mild tingling for sensitive skin",
+        "Price": "₹699"
+    }
+
+    final_state = run_graph(raw_product, dry_run=args.dry_run, use_hybrid_qa=use_hybrid)
+
+    # Write outputs if not dry-run
+    if not args.dry_run:
+        write_outputs(final_state)
 
     print("Graph run complete. approved:", final_state.get("approved"))
     print("Critique:", final_state.get("critique"))
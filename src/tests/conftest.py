@@ -3,7 +3,28 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # repo root is two levels up from src/tests/
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def raw_product():
+    """Factory for raw product dicts as they come from the catalog: raw_product("A", Price="10")."""
+    def make(name="GlowBoost Vitamin C Serum", **fields):
+        product = {
+            "Product Name": name,
+            "Concentration": "10% Vitamin C",
+            "Skin Type": "Oily, Combination",
+            "Key Ingredients": "Vitamin C, Hyaluronic Acid",
+            "Benefits": "Brightening, Fades dark spots",
+            "How to Use": "Apply 2–3 drops in the morning before sunscreen",
+            "Side Effects": "Mild tingling for sensitive skin",
+            "Price": "₹699",
+        }
+        product.update(fields)
+        return product
+    return make
@@ -0,0 +1,43 @@
+from src.graph.batch_runner import run_catalog
+from src.graph.orchestrator import compile_graph, initial_state
+from src.utils.progress_journal import ProgressJournal, input_hash, COMPLETED
+
+
+def test_journal_skips_completed_products_on_resume(tmp_path, raw_product):
+    journal = ProgressJournal(tmp_path / "journal.jsonl")
+    products = [raw_product("A"), raw_product("B")]
+    written = []
+
+    summary = run_catalog(products[:1], journal=journal, write_outputs=lambda s: written.append(s["run_id"]) or "out")
+    assert summary["completed"] == 1
+    assert journal.latest()[input_hash(products[0])]["status"] == COMPLETED
+
+    summary = run_catalog(products, journal=journal, write_outputs=lambda s: written.append(s["run_id"]), resume=True)
+    assert summary == {"completed": 1, "skipped": 1, "resumed": 0, "failed": 0}
+    assert len(written) == 2
+
+
+def test_resume_restarts_from_checkpoint(tmp_path, raw_product):
+    journal = ProgressJournal(tmp_path / "journal.jsonl")
+    raw = raw_product("Checkpointed")
+    h = input_hash(raw)
+
+    # simulate a crash right after the QA node was checkpointed
+    state = compile_graph().invoke(initial_state(raw))
+    state["qa_pairs"] = [{"q": "kept?", "a": "yes"}] * 12
+    journal.save_checkpoint(h, "content", state)
+    journal.record(h, state["run_id"], "checkpoint", node="qa")
+
+    finals = []
+    summary = run_catalog([raw], journal=journal, write_outputs=finals.append, resume=True)
+    assert summary["resumed"] == 1 and summary["completed"] == 1
+    assert finals[0]["run_id"] == state["run_id"]
+    assert finals[0]["qa_pairs"][0]["q"] == "kept?"
+    assert journal.load_checkpoint(h) is None
+
+
+def test_checkpoints_written_after_configured_nodes(tmp_path, raw_product):
+    journal = ProgressJournal(tmp_path / "journal.jsonl")
+    run_catalog([raw_product("C")], journal=journal, checkpoint_after=("qa",))
+    statuses = [e["status"] for e in journal.entries()]
+    assert statuses == ["started", "checkpoint", "completed"]
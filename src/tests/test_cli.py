@@ -0,0 +1,29 @@
+# src/tests/test_cli.py
+import pytest
+from src.main import parse_args
+
+
+def _arg_error(argv, capsys):
+    with pytest.raises(SystemExit) as exc:
+        parse_args(argv)
+    assert exc.value.code == 2
+    return capsys.readouterr().err
+
+
+def test_stage_workers_are_parsed_and_validated(capsys):
+    args = parse_args(["--input", "c.jsonl", "--pipeline", "--stage-workers", "qa=8, write=2"])
+    assert args.stage_workers == {"qa": 8, "write": 2}
+    assert "expected qa=<workers>" in _arg_error(["--input", "c.jsonl", "--pipeline", "--stage-workers", "qa"], capsys)
+    assert "expected qa=<workers>" in _arg_error(["--input", "c.jsonl", "--stage-workers", "qa=0"], capsys)
+    assert "unknown stage 'render'" in _arg_error(["--input", "c.jsonl", "--stage-workers", "render=2"], capsys)
+    assert "--pipeline requires --input" in _arg_error(["--pipeline"], capsys)
+
+
+def test_queue_and_worker_flags_require_each_other(capsys):
+    assert "--worker requires --queue" in _arg_error(["--worker"], capsys)
+    assert "--queue needs --input" in _arg_error(["--queue", "jobs.db"], capsys)
+    assert parse_args(["--queue", "jobs.db", "--worker"]).worker
+
+
+def test_resume_rejects_dry_run(capsys):
+    assert "--resume cannot be combined with --dry-run" in _arg_error(["--input", "c.jsonl", "--resume", "--dry-run"], capsys)
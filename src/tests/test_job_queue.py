@@ -0,0 +1,95 @@
+from src.distributed.job_queue import SQLiteJobQueue
+from src.distributed.worker import enqueue_products, run_worker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_claim_ack_and_idempotent_enqueue(tmp_path):
+    q = SQLiteJobQueue(tmp_path / "q.db")
+    assert q.enqueue({"x": 1}, job_id="a") == "a"
+    assert q.enqueue({"x": 2}, job_id="a") is None
+    job = q.claim("w1")
+    assert job["payload"] == {"x": 1} and job["attempts"] == 1
+    assert q.claim("w2") is None
+    assert not q.ack("a", "w2")
+    assert q.ack("a", "w1", {"ok": True})
+    assert q.result("a") == {"ok": True}
+    assert q.stats()["done"] == 1
+
+
+def test_visibility_timeout_redelivers_then_dead_letters(tmp_path):
+    clock = FakeClock()
+    q = SQLiteJobQueue(tmp_path / "q.db", visibility_timeout=10, max_attempts=2, clock=clock)
+    q.enqueue({"x": 1}, job_id="a")
+    assert q.claim("w1")["attempts"] == 1
+    clock.now += 11
+    job = q.claim("w2")
+    assert job["worker"] == "w2" and job["attempts"] == 2
+    assert not q.ack("a", "w1")  # stale worker lost the lease
+    clock.now += 11
+    assert q.claim("w3") is None
+    assert [d["id"] for d in q.dead_letters()] == ["a"]
+
+
+def test_fail_retries_after_delay(tmp_path):
+    clock = FakeClock()
+    q = SQLiteJobQueue(tmp_path / "q.db", max_attempts=2, retry_delay=5, clock=clock)
+    q.enqueue({"x": 1}, job_id="a")
+    q.claim("w1")
+    assert q.fail("a", "w1", "boom")
+    assert q.claim("w1") is None
+    clock.now += 5
+    q.claim("w1")
+    q.fail("a", "w1", "boom again")
+    assert q.dead_letters()[0]["error"] == "boom again"
+    assert q.requeue_dead() == 1
+
+
+def test_worker_drains_queue(tmp_path, raw_product):
+    q = SQLiteJobQueue(tmp_path / "q.db")
+    assert enqueue_products(q, [raw_product("A"), raw_product("B"), raw_product("A")]) == 2
+    written = []
+    summary = run_worker(q, worker_id="w", write_outputs=lambda s: written.append(s["run_id"]) or "out",
+                         stop_when_empty=True, poll_interval=0)
+    assert summary == {"acked": 2, "failed": 0, "lost": 0}
+    assert q.stats() == {"queued": 0, "running": 0, "done": 2, "dead": 0}
+    assert len(written) == 2
+
+
+def test_worker_heartbeat_keeps_lease(tmp_path, raw_product):
+    import time
+    q = SQLiteJobQueue(tmp_path / "q.db", visibility_timeout=0.3, journal_mode="DELETE")
+    enqueue_products(q, [raw_product("A")])
+    other = SQLiteJobQueue(tmp_path / "q.db", journal_mode="DELETE")
+
+    def slow_write(state):
+        time.sleep(0.8)  # well past the 0.3s lease without renewal
+        assert other.claim("thief") is None
+        return "out"
+
+    summary = run_worker(q, worker_id="w", write_outputs=slow_write, stop_when_empty=True,
+                         poll_interval=0, heartbeat_interval=0.05)
+    assert summary == {"acked": 1, "failed": 0, "lost": 0}
+
+
+def test_worker_counts_failure_after_lost_lease_as_lost(tmp_path, raw_product):
+    q = SQLiteJobQueue(tmp_path / "q.db", visibility_timeout=0.3)
+    enqueue_products(q, [raw_product("A")])
+    other = SQLiteJobQueue(tmp_path / "q.db")
+
+    def steal_then_fail(state):
+        import time
+        time.sleep(0.4)
+        assert other.claim("thief") is not None
+        raise RuntimeError("boom")
+
+    summary = run_worker(q, worker_id="w", write_outputs=steal_then_fail, max_jobs=1,
+                         poll_interval=0, heartbeat_interval=60)
+    assert summary == {"acked": 0, "failed": 0, "lost": 1}
+    assert q.stats()["running"] == 1  # still owned by the thief, not retried by the stale worker
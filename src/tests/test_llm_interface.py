@@ -1,6 +1,8 @@
 # src/tests/test_llm_interface.py
 import os
+import pytest
 from src.agents.llm_qa_agent import HybridQAGeneratorAgent
+from src.agents.parser_agent import ParserAgent
 from src.models.product_model import ProductModel
 
 def test_hybrid_agent_fallback():
@@ -21,3 +23,62 @@ def test_hybrid_agent_fallback():
     qa = agent.run(product)
     assert isinstance(qa, list)
     assert len(qa) >= 15
+
+
+class FakeLLMClient:
+    """Local stand-in for an LLM: records prompts and replies with a scripted function."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def complete(self, prompt, max_tokens=150):
+        self.prompts.append(prompt)
+        return self.reply(prompt)
+
+
+@pytest.fixture
+def product(raw_product):
+    return ParserAgent().run(raw_product())
+
+
+def _json_reply(prompt, skip=()):
+    import json
+    items = json.loads(prompt.split("Items (JSON): ", 1)[1].split("\n", 1)[0])
+    return "```json\n" + json.dumps({it["id"]: f"Refined {it['id']}" for it in items if it["id"] not in skip}) + "\n```"
+
+
+def test_batched_refinement_uses_one_request_per_chunk(product):
+    client = FakeLLMClient(_json_reply)
+    qa = HybridQAGeneratorAgent(batch_size=0, client=client).run(product)
+    assert len(client.prompts) == 1
+    assert all(item["a"].startswith("Refined ") for item in qa)
+
+    client = FakeLLMClient(_json_reply)
+    qa = HybridQAGeneratorAgent(batch_size=4, client=client).run(product)
+    assert len(client.prompts) == (len(qa) + 3) // 4
+
+
+def test_batched_refinement_falls_back_per_item(product):
+    deterministic = HybridQAGeneratorAgent().base.run(product)
+    client = FakeLLMClient(lambda p: _json_reply(p, skip={"2"}).replace('"Refined 3"', "null"))
+    qa = HybridQAGeneratorAgent(batch_size=0, client=client).run(product)
+    assert qa[0]["a"] == "Refined 1"
+    assert qa[1]["a"] == deterministic[1]["a"]
+    assert qa[2]["a"] == deterministic[2]["a"]
+
+    qa = HybridQAGeneratorAgent(batch_size=0, client=FakeLLMClient(lambda p: "not json")).run(product)
+    assert [item["a"] for item in qa] == [item["a"] for item in deterministic]
+
+
+def test_llm_batch_size_env_is_validated(monkeypatch):
+    monkeypatch.setenv("LLM_BATCH_SIZE", " All ")
+    assert HybridQAGeneratorAgent().batch_size == 0
+    monkeypatch.setenv("LLM_BATCH_SIZE", "8")
+    assert HybridQAGeneratorAgent().batch_size == 8
+    for bad in ("abc", "-2", "1.5"):
+        monkeypatch.setenv("LLM_BATCH_SIZE", bad)
+        with pytest.raises(ValueError, match="LLM_BATCH_SIZE must be 'all' or a non-negative integer"):
+            HybridQAGeneratorAgent()
+    with pytest.raises(ValueError, match="batch_size must be >= 0"):
+        HybridQAGeneratorAgent(batch_size=-1)
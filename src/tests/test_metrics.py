@@ -0,0 +1,34 @@
+from src.utils.metrics import MetricsRegistry, REGISTRY, write_metrics_file
+from src.graph.orchestrator import run_graph
+
+
+def test_registry_renders_prometheus_text():
+    reg = MetricsRegistry()
+    c = reg.counter("jobs_total", "Jobs.", labels=("outcome",))
+    c.labels(outcome="ok").inc()
+    c.labels(outcome="ok").inc(2)
+    h = reg.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    g = reg.gauge("ratio", "Ratio.")
+    g.set_function(lambda: 0.25)
+    assert reg.counter("jobs_total", "Jobs.", labels=("outcome",)) is c
+
+    text = reg.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{outcome="ok"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+    assert "ratio 0.25" in text
+
+
+def test_pipeline_records_node_latency_and_loop_counts(tmp_path, raw_product):
+    run_graph(raw_product("M"), dry_run=True)
+    path = tmp_path / "metrics.prom"
+    write_metrics_file(path)
+    text = path.read_text(encoding="utf-8")
+    assert 'graph_node_duration_seconds_count{node="qa"}' in text
+    assert 'graph_node_visits_per_run_count{node="critique"}' in text
+    assert 'cache_hit_ratio{cache="graph_plan"}' in text
+    assert REGISTRY.get("graph_runs_total").labels(outcome="ok").get() >= 1
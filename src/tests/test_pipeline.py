@@ -0,0 +1,75 @@
+import threading
+import time
+from src.graph.pipeline import Stage, StagePipeline, StageFailure
+from src.graph.orchestrator import build_stage_pipeline
+
+
+def test_stages_process_all_items_with_failures_passed_through():
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    pipeline = StagePipeline([Stage("double", lambda x: x * 2, workers=2),
+                              Stage("check", lambda x: boom(x // 2), workers=3),
+                              Stage("inc", lambda x: x + 1)], queue_size=4)
+    results = list(pipeline.run(range(20)))
+    failures = [r for r in results if isinstance(r, StageFailure)]
+    assert sorted(r for r in results if not isinstance(r, StageFailure)) == [x + 1 for x in range(20) if x != 3]
+    assert len(failures) == 1 and failures[0].stage == "check"
+
+    stats = pipeline.stats()
+    assert stats["double"]["processed"] == 20
+    assert stats["check"]["failed"] == 1
+    assert stats["inc"]["processed"] == 20
+    assert all(0.0 <= s["utilization"] <= 1.0 for s in stats.values())
+
+
+def test_backpressure_bounds_in_flight_items():
+    lock = threading.Lock()
+    fed = [0]
+    consumed = [0]
+    max_in_flight = [0]
+
+    def source():
+        for i in range(200):
+            with lock:
+                fed[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], fed[0] - consumed[0])
+            yield i
+
+    def slow(x):
+        time.sleep(0.001)
+        return x
+
+    pipeline = StagePipeline([Stage("fast", lambda x: x), Stage("slow", slow)], queue_size=5)
+    for _ in pipeline.run(source()):
+        with lock:
+            consumed[0] += 1
+    # two input queues + result queue of 5, plus one item held by each thread
+    assert max_in_flight[0] <= 3 * 5 + 4
+    assert pipeline.stats()["slow"]["queue_depth_max"] <= 5
+
+
+def test_early_exit_stops_workers():
+    pipeline = StagePipeline([Stage("id", lambda x: x)], queue_size=2)
+    gen = pipeline.run(iter(range(10_000)))
+    assert next(gen) == 0
+    gen.close()
+    assert pipeline.stats()["id"]["processed"] < 10_000
+
+
+def test_graph_stage_pipeline_matches_invoke(raw_product):
+    raw = raw_product("Piped")
+    from src.graph.state_graph import GRAPH_RUNS
+    runs_before = GRAPH_RUNS.labels(outcome="ok").get()
+    written = []
+    pipeline = build_stage_pipeline(write_outputs=lambda s: written.append(s["run_id"]) or "out",
+                                    workers={"qa": 2})
+    results = list(pipeline.run([raw] * 6))
+    assert len(results) == 6
+    for state, output in results:
+        assert state["approved"] is True
+        assert "comparison" in state and output == "out"
+    assert len(set(written)) == 6
+    assert GRAPH_RUNS.labels(outcome="ok").get() - runs_before == 6  # one per product, not per segment
@@ -19,3 +19,191 @@ def test_retrieval_build_and_query():
     assert len(results) <= 2
     # The expected best match contains "Apply 2-3 drops"
     assert any("Apply" in r or "apply" in r for r in results)
+
+
+class HashingEncoder:
+    """Tiny deterministic stand-in for SentenceTransformer (bag of hashed words)."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        import zlib
+        import numpy as np
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(".", " ").replace("?", " ").split():
+                out[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+            norm = np.linalg.norm(out[row])
+            if norm:
+                out[row] /= norm
+        return out
+
+
+def _agent(**kwargs):
+    pytest.importorskip("faiss")
+    return RetrievalAgent(model=HashingEncoder(), **kwargs)
+
+
+def test_compact_corpus_round_trips():
+    from src.agents.retrieval_agent import CompactCorpus
+    corpus = CompactCorpus(["a", "", "₹699 serum"])
+    assert len(corpus) == 3
+    assert list(corpus) == ["a", "", "₹699 serum"]
+    assert corpus[-1] == "₹699 serum"
+    with pytest.raises(IndexError):
+        corpus[3]
+
+
+@pytest.mark.parametrize("index_type", ["fp16", "sq8", "pq"])
+def test_quantized_index_with_rerank(index_type):
+    agent = _agent(index_type=index_type, rerank_k=3, pq_m=8)
+    agent.build_index(SAMPLE_TEXTS)
+    assert type(agent.corpus).__name__ == "CompactCorpus"
+    results = agent.query("Apply drops in the morning", top_k=1)
+    assert results == [SAMPLE_TEXTS[0]]
+
+
+def test_rerank_from_stored_vectors_skips_reencoding(tmp_path):
+    agent = _agent(index_type="sq8", rerank_k=3, vectors_path=tmp_path / "vectors.bin")
+    agent.build_index(SAMPLE_TEXTS)
+    calls = []
+    agent._encode = lambda texts, op: calls.append(op) or RetrievalAgent._encode(agent, texts, op)
+    assert agent.query("Apply drops in the morning", top_k=1) == [SAMPLE_TEXTS[0]]
+    assert calls == ["query"]
+
+
+def test_rebuild_keeps_old_vector_mapping_readable(tmp_path):
+    import numpy as np
+    texts = [f"serum number {i} for skin" for i in range(200)]
+    agent = _agent(index_type="sq8", rerank_k=3, vectors_path=tmp_path / "vectors.bin")
+    agent.build_index(texts)
+    old = agent.vectors
+    expected = np.array(old[150])
+    agent.build_index(SAMPLE_TEXTS[:1])  # much smaller file at the same path
+    assert agent.vectors.shape[0] == 1
+    assert np.array_equal(old[150], expected)  # would SIGBUS if the file were truncated in place
+    assert list(tmp_path.iterdir()) == [tmp_path / "vectors.bin"]
+
+
+def test_invalid_index_type():
+    with pytest.raises(ValueError):
+        _agent(index_type="int4")
+
+
+def test_length_batches_group_similar_lengths():
+    from src.agents.retrieval_agent import length_batches
+    texts = ["x" * n for n in (50, 1, 3, 40, 2, 45)]
+    assert length_batches(texts, batch_size=3) == [[1, 4, 2], [3, 5, 0]]
+    assert length_batches(texts, batch_size=10, max_batch_chars=100) == [[1, 4, 2], [3, 5], [0]]
+
+
+def test_multiprocess_build_matches_single_process():
+    import numpy as np
+    texts = SAMPLE_TEXTS * 5 + ["short", "a much longer sentence about sunscreen and serum usage"]
+    single = _agent(batch_size=4)
+    single.build_index(texts)
+    seen = []
+    multi = _agent(batch_size=4, encode_workers=2, mp_context="fork")
+    multi.build_index(texts, progress=lambda done, total: seen.append((done, total)))
+    assert seen[-1] == (len(texts), len(texts))
+    a = single.index.reconstruct_n(0, len(texts))
+    b = multi.index.reconstruct_n(0, len(texts))
+    assert np.allclose(a, b)
+    assert multi.query("Apply drops in the morning", top_k=1) == [SAMPLE_TEXTS[0]]
+
+
+def test_encode_worker_limits_torch_threads(monkeypatch):
+    import sys
+    import types
+    from src.agents import retrieval_agent
+    calls = []
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(set_num_threads=calls.append))
+    monkeypatch.setattr(retrieval_agent, "_WORKER_MODEL", None)
+    encoder = HashingEncoder()
+    retrieval_agent._init_encode_worker("unused", encoder, 2)
+    assert calls == [2] and retrieval_agent._WORKER_MODEL is encoder
+
+
+def test_query_cache_exact_semantic_and_invalidation():
+    from src.utils.query_cache import QueryCache
+    cache = QueryCache(maxsize=8, similarity_threshold=0.8)
+    agent = _agent(query_cache=cache)
+    agent.build_index(SAMPLE_TEXTS)
+
+    first = agent.query("How to apply in the morning?", top_k=1)
+    assert agent.query("how to APPLY in the morning", top_k=1) == first
+    assert cache.stats()["hits"] == 1
+    # same words, different order: an exact miss but an embedding-similarity hit
+    assert agent.query("in the morning how to apply", top_k=1) == first
+    assert cache.stats()["semantic_hits"] == 1
+    # the paraphrase was stored under its own key: repeating it is an exact hit
+    assert agent.query("In the morning, how to apply?", top_k=1) == first
+    assert cache.stats()["hits"] == 2
+    assert agent.query("oily skin types", top_k=1) != first
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hit_ratio"] == 3 / 5
+
+    generation = cache.generation
+    agent.build_index(SAMPLE_TEXTS[1:])
+    assert len(cache) == 0
+    # a search that started against the old index must not re-fill the cache
+    cache.put("stale", 1, ["old"], generation=generation)
+    assert len(cache) == 0
+
+
+class AngleEncoder:
+    """Maps each known text to a unit vector at a fixed angle (degrees) in 2-D."""
+
+    def __init__(self, angles):
+        self.angles = angles
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        import numpy as np
+        rad = np.radians([self.angles[t] for t in texts])
+        return np.stack([np.cos(rad), np.sin(rad)], axis=1).astype(np.float32)
+
+
+def test_semantic_hits_do_not_chain_through_paraphrases():
+    pytest.importorskip("faiss")
+    from src.utils.query_cache import QueryCache
+    # cos(30 deg) = 0.87 >= 0.8 > cos(60 deg) = 0.5: B is close to A and C to B, but C is not close to A
+    encoder = AngleEncoder({"east": 0, "north": 90, "west": 180, "A": 0, "B": 30, "C": 60})
+    cache = QueryCache(similarity_threshold=0.8, name="test_chain")
+    agent = RetrievalAgent(model=encoder, query_cache=cache)
+    agent.build_index(["east", "north", "west"])
+    assert agent.query("A", top_k=1) == ["east"]
+    assert agent.query("B", top_k=1) == ["east"]
+    assert cache.stats()["semantic_hits"] == 1
+    assert agent.query("B", top_k=1) == ["east"]  # stored as an exact alias
+    assert cache.stats()["hits"] == 1
+    assert agent.query("C", top_k=1) == ["north"]
+    assert cache.stats()["semantic_hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_query_cache_lru_and_ttl():
+    from src.utils.query_cache import QueryCache
+    now = [0.0]
+    cache = QueryCache(maxsize=2, ttl=10, clock=lambda: now[0], name="test_cache")
+    cache.put("a", 1, ["A"])
+    cache.put("b", 1, ["B"])
+    assert cache.get("A?", 1) == ["A"]
+    cache.put("c", 1, ["C"])
+    assert cache.get("b", 1) is None  # least recently used was evicted
+    now[0] = 11
+    assert cache.get("a", 1) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    assert cache.stats()["hit_ratio"] == 1 / 3
+
+
+def test_query_caches_sharing_a_name_are_summed_in_metrics():
+    from src.utils.metrics import REGISTRY
+    from src.utils.query_cache import QueryCache
+    first, second = QueryCache(name="shared_cache"), QueryCache(name="shared_cache")
+    first.put("a", 1, ["A"])
+    first.get("a", 1)
+    second.get("a", 1)
+    lookups = REGISTRY.get("cache_lookups_total")
+    assert lookups.labels(cache="shared_cache", result="hit").get() == 1
+    assert lookups.labels(cache="shared_cache", result="miss").get() == 1
+    assert REGISTRY.get("cache_hit_ratio").labels(cache="shared_cache").get() == 0.5
@@ -0,0 +1,143 @@
+import pytest
+from src.graph.state_graph import StateGraph, GraphValidationError
+from src.graph.orchestrator import compile_graph
+
+
+def _linear_graph():
+    g = StateGraph()
+    g.add_node("a", lambda s: {**s, "trace": s.get("trace", []) + ["a"]})
+    g.add_node("b", lambda s: {**s, "trace": s["trace"] + ["b"]})
+    g.add_node("c", lambda s: {**s, "trace": s["trace"] + ["c"]})
+    g.set_start("a")
+    g.add_edge("a", "b")
+    g.add_edge("b", "c")
+    return g
+
+
+def test_compiled_plan_runs_and_is_reusable():
+    plan = _linear_graph().compile()
+    assert plan.start_node == "a"
+    assert plan.next_node("a") == "b"
+    assert plan.invoke({})["trace"] == ["a", "b", "c"]
+    assert plan.invoke({"trace": ["x"]})["trace"] == ["x", "a", "b", "c"]
+    with pytest.raises(AttributeError):
+        plan.max_steps = 5
+
+
+def test_compile_requires_explicit_start():
+    g = StateGraph()
+    g.add_node("a", lambda s: s)
+    with pytest.raises(GraphValidationError, match="start node"):
+        g.compile()
+
+
+def test_compile_rejects_missing_target_and_unreachable():
+    g = _linear_graph()
+    g.add_edge("c", "missing")
+    with pytest.raises(GraphValidationError, match="unknown node"):
+        g.compile()
+
+    g = _linear_graph()
+    g.add_node("orphan", lambda s: s)
+    with pytest.raises(GraphValidationError, match="Unreachable nodes: orphan"):
+        g.compile()
+
+
+def test_compile_rejects_cycle_without_exit():
+    g = _linear_graph()
+    g.add_edge("c", "a")
+    with pytest.raises(GraphValidationError, match="Cycle without exit"):
+        g.compile()
+
+
+def test_conditional_loop_guard_and_declared_targets():
+    g = StateGraph()
+    g.add_node("loop", lambda s: {**s, "n": s.get("n", 0) + 1})
+    g.add_node("done", lambda s: s)
+    g.set_start("loop")
+    g.add_conditional_edge("loop", lambda s: "done" if s["n"] >= 3 else "loop", targets=("loop", "done"))
+    g.set_end("done")
+    assert g.compile().invoke({})["n"] == 3
+    with pytest.raises(RuntimeError, match="too many steps"):
+        g.compile(max_steps=2).invoke({})
+
+    g.add_conditional_edge("loop", lambda s: "elsewhere", targets=("loop", "done"))
+    with pytest.raises(RuntimeError, match="Node not found: elsewhere"):
+        g.compile().invoke({})
+
+
+def test_pipeline_graph_compiles_once():
+    assert compile_graph() is compile_graph()
+    assert compile_graph().start_node == "parser"
+
+
+def test_ainvoke_matches_sync_semantics():
+    import asyncio
+
+    async def slow_inc(s):
+        await asyncio.sleep(0)
+        return {**s, "n": s.get("n", 0) + 1}
+
+    g = StateGraph()
+    g.add_node("loop", slow_inc)
+    g.add_node("sync", lambda s: {**s, "synced": True})
+    g.add_node("done", lambda s: s)
+    g.set_start("loop")
+    g.add_conditional_edge("loop", lambda s: "sync" if s["n"] >= 3 else "loop", targets=("loop", "sync"))
+    g.add_edge("sync", "done")
+    g.set_end("done")
+    plan = g.compile()
+
+    state = asyncio.run(plan.ainvoke({}))
+    assert state == {"n": 3, "synced": True}
+    with pytest.raises(RuntimeError, match="use ainvoke"):
+        plan.invoke({})
+    with pytest.raises(RuntimeError, match="too many steps"):
+        asyncio.run(g.compile(max_steps=2).ainvoke({}))
+
+    results = asyncio.run(plan.ainvoke_many([{"n": 5}, {}, {"n": 10}], concurrency=2))
+    assert [r["n"] for r in results] == [6, 3, 11]
+
+
+def test_arun_graph_many_runs_pipeline(raw_product):
+    import asyncio
+    from src.graph.orchestrator import arun_graph_many
+    raw = raw_product("Async")
+    states = asyncio.run(arun_graph_many([raw] * 5, concurrency=3))
+    assert len(states) == 5
+    assert all(s["approved"] for s in states)
+    assert len({s["run_id"] for s in states}) == 5
+
+
+def test_compile_rejects_conditional_cycle_without_exit():
+    g = StateGraph()
+    for name in ("a", "b", "c", "end"):
+        g.add_node(name, lambda s: s)
+    g.set_start("a")
+    g.add_conditional_edge("a", lambda s: "b", targets=("b", "end"))
+    g.add_edge("b", "c")
+    g.add_conditional_edge("c", lambda s: "b", targets=("b",))
+    g.set_end("end")
+    with pytest.raises(GraphValidationError, match="no end node reachable from b, c"):
+        g.compile()
+
+    g.add_conditional_edge("c", lambda s: "end", targets=("b", "end"))
+    assert g.compile().invoke({}) == {}
+
+
+def test_awaitable_from_sync_looking_node():
+    import asyncio
+
+    async def tag(s, label):
+        await asyncio.sleep(0)
+        return {**s, "tag": label}
+
+    g = StateGraph()
+    g.add_node("a", lambda s: tag(s, "x"))  # plain function returning a coroutine
+    g.add_node("b", lambda s: {**s, "after": s["tag"]})
+    g.set_start("a")
+    g.add_edge("a", "b")
+    plan = g.compile()
+    with pytest.raises(RuntimeError, match="'a' returned an awaitable; use ainvoke"):
+        plan.invoke({})
+    assert asyncio.run(plan.ainvoke({})) == {"tag": "x", "after": "x"}
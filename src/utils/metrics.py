@@ -0,0 +1,267 @@
+# src/utils/metrics.py
+"""
+Minimal in-process metrics registry with Prometheus text exposition.
+Metrics are created once at import time of the instrumented module, e.g.
+
+    NODE_LATENCY = REGISTRY.histogram("graph_node_duration_seconds", "...", labels=("node",))
+    NODE_LATENCY.labels(node="qa").observe(0.12)
+
+and exported with REGISTRY.render(), write_metrics_file() or serve_metrics().
+"""
+from typing import Dict, Tuple, Optional, Callable, List, Sequence
+from pathlib import Path
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **values: str):
+        key = tuple(str(values[n]) for n in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        if not self.label_names:
+            return self._child_samples(self._unlabelled(), ())
+        lines: List[str] = []
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._child_samples(child, key))
+        return lines
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def _child_samples(self, child, key) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Compute the value lazily at scrape time (e.g. from a cache's own counters)."""
+        self._fn = fn
+
+    def get(self) -> float:
+        return float(self._fn()) if self._fn is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def _child_samples(self, child, key):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self._unlabelled().set_function(fn)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    def __init__(self, target: _HistogramValue) -> None:
+        self.target = target
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+    def _child_samples(self, child, key):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric already registered with a different type/labels: {metric.name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result (hit / miss).",
+                                 labels=("cache", "result"))
+CACHE_HIT_RATIO = REGISTRY.gauge("cache_hit_ratio", "Hits / lookups for each cache.", labels=("cache",))
+
+
+def register_cache(name: str, hits: Callable[[], float], misses: Callable[[], float]) -> None:
+    """Expose a cache's own hit/miss counters (read at scrape time) plus its hit ratio."""
+    CACHE_LOOKUPS.labels(cache=name, result="hit").set_function(hits)
+    CACHE_LOOKUPS.labels(cache=name, result="miss").set_function(misses)
+
+    def hit_ratio() -> float:
+        h, m = hits(), misses()
+        return h / (h + m) if (h + m) else 0.0
+
+    CACHE_HIT_RATIO.labels(cache=name).set_function(hit_ratio)
+
+
+def write_metrics_file(path: Path, registry: MetricsRegistry = REGISTRY) -> None:
+    """Dump metrics at the end of a batch (e.g. for the node_exporter textfile collector)."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(registry.render(), encoding="utf-8")
+    tmp.replace(path)
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY):
+    """Serve /metrics from a daemon thread; returns the HTTP server (call shutdown() to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
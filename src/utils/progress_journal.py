@@ -0,0 +1,91 @@
+# src/utils/progress_journal.py
+from typing import Dict, Any, Optional, Iterator, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import pickle
+import time
+
+STARTED = "started"
+CHECKPOINT = "checkpoint"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def input_hash(raw_input: Dict[str, Any]) -> str:
+    """Stable hash of a raw product dict (key order does not matter)."""
+    payload = json.dumps(raw_input, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ProgressJournal:
+    """
+    Append-only JSONL journal of batch progress, one line per event:
+    {"input_hash", "run_id", "status", "output", "ts", ...}.
+    The last line for an input hash is its current status. Graph state checkpoints
+    are pickled next to the journal in checkpoint_dir, one file per input hash.
+    """
+
+    def __init__(self, path: Path, checkpoint_dir: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else self.path.parent / "checkpoints"
+
+    def record(self, input_hash: str, run_id: Optional[str], status: str,
+               output: Optional[Any] = None, **extra: Any) -> None:
+        entry = {"input_hash": input_hash, "run_id": run_id, "status": status, "output": output, "ts": time.time()}
+        entry.update(extra)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a crash mid-write can leave a truncated last line
+                    continue
+
+    def latest(self) -> Dict[str, Dict[str, Any]]:
+        """Most recent entry per input hash."""
+        latest: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries():
+            latest[entry["input_hash"]] = entry
+        return latest
+
+    def _checkpoint_path(self, input_hash: str) -> Path:
+        return self.checkpoint_dir / f"{input_hash}.pkl"
+
+    def save_checkpoint(self, input_hash: str, next_node: str, state: Dict[str, Any]) -> None:
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        path = self._checkpoint_path(input_hash)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump({"next_node": next_node, "state": state}, f)
+        tmp.replace(path)
+
+    def load_checkpoint(self, input_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        path = self._checkpoint_path(input_hash)
+        if not path.exists():
+            return None
+        try:
+            with path.open("rb") as f:
+                data = pickle.load(f)
+        except Exception:
+            return None
+        return data["next_node"], data["state"]
+
+    def clear_checkpoint(self, input_hash: str) -> None:
+        path = self._checkpoint_path(input_hash)
+        if path.exists():
+            path.unlink()
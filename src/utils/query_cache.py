@@ -0,0 +1,183 @@
+# src/utils/query_cache.py
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import re
+import threading
+import time
+import numpy as np
+from .metrics import REGISTRY, register_cache
+
+CACHE_SAVED_SECONDS = REGISTRY.counter("query_cache_saved_seconds_total",
+                                       "Estimated encode/search time avoided by query cache hits.",
+                                       labels=("cache",))
+
+# per-name [hits, misses] summed over every QueryCache sharing that metrics name
+_TOTALS: Dict[str, List[int]] = {}
+_TOTALS_LOCK = threading.Lock()
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace: "How to use?" == "how  to use"."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of retrieval results keyed by (normalized query, top_k).
+
+    Exact hits skip both encoding and search. With similarity_threshold set, a miss
+    can still be served by a cached query whose embedding has cosine similarity >=
+    threshold (paraphrases); that skips only the index search, since the new query
+    had to be encoded to compare. Each lookup counts exactly one hit or miss: get()
+    counts its misses when semantic matching is off, otherwise get_similar() does.
+
+    Owners call clear() after the index changes; clear() bumps `generation`, and a
+    put() tagged with an older generation (a search that started before the swap)
+    is dropped. Hit/miss counts and estimated time saved are exported as metrics
+    under `name`; caches sharing a name are summed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 similarity_threshold: Optional[float] = None, name: str = "retrieval_query",
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.name = name
+        self.clock = clock
+        # key -> (results, unit embedding or None, expires_at or None)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[List[Any], Optional[np.ndarray], Optional[float]]]" = \
+            OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.generation = 0
+        self._costs_seen = 0
+        # running averages of the cost of a miss, used to estimate time saved by hits
+        self._avg_encode = 0.0
+        self._avg_search = 0.0
+        self._saved = CACHE_SAVED_SECONDS.labels(cache=name)
+        with _TOTALS_LOCK:
+            if name not in _TOTALS:
+                totals = _TOTALS[name] = [0, 0]
+                register_cache(name, lambda: totals[0], lambda: totals[1])
+            self._totals = _TOTALS[name]
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None
+
+    def _count(self, hit: bool) -> None:
+        with _TOTALS_LOCK:
+            self._totals[0 if hit else 1] += 1
+
+    def _live(self, key, entry, now: float) -> bool:
+        expires = entry[2]
+        if expires is not None and expires <= now:
+            del self._entries[key]
+            return False
+        return True
+
+    def get(self, query: str, top_k: int) -> Optional[List[Any]]:
+        """Exact (normalized) lookup; a miss is counted here unless get_similar() follows."""
+        key = (normalize_query(query), top_k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._live(key, entry, self.clock()):
+                if not self.semantic:
+                    self.misses += 1
+                    self._count(hit=False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._count(hit=True)
+            saved = self._avg_encode + self._avg_search
+            self.saved_seconds += saved
+        self._saved.inc(saved)
+        return list(entry[0])
+
+    def get_similar(self, embedding: np.ndarray, top_k: int) -> Optional[List[Any]]:
+        """Paraphrase lookup by cosine similarity among entries cached for the same top_k."""
+        if not self.semantic:
+            return None
+        vec = _unit(embedding)
+        with self._lock:
+            now = self.clock()
+            keys, vecs = [], []
+            for key, entry in list(self._entries.items()):
+                if key[1] == top_k and entry[1] is not None and self._live(key, entry, now):
+                    keys.append(key)
+                    vecs.append(entry[1])
+            best = None
+            if keys:
+                sims = np.stack(vecs) @ vec
+                best = int(np.argmax(sims))
+                if sims[best] < self.similarity_threshold:
+                    best = None
+            if best is None:
+                self.misses += 1
+                self._count(hit=False)
+                return None
+            key = keys[best]
+            self._entries.move_to_end(key)
+            results = list(self._entries[key][0])
+            self.semantic_hits += 1
+            self._count(hit=True)
+            saved = self._avg_search
+            self.saved_seconds += saved
+        self._saved.inc(saved)
+        return results
+
+    def put(self, query: str, top_k: int, results: List[Any], embedding: Optional[np.ndarray] = None,
+            generation: Optional[int] = None) -> None:
+        """Store results; pass the `generation` read before searching to drop results of a replaced index."""
+        key = (normalize_query(query), top_k)
+        vec = _unit(embedding) if (embedding is not None and self.semantic) else None
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (list(results), vec, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def record_cost(self, encode_seconds: float, search_seconds: float) -> None:
+        """Report what a miss cost, used to estimate the time later hits save."""
+        with self._lock:
+            self._costs_seen += 1
+            # exponential moving average; the first sample seeds it
+            alpha = 1.0 if self._costs_seen == 1 else 0.1
+            self._avg_encode += alpha * (encode_seconds - self._avg_encode)
+            self._avg_search += alpha * (search_seconds - self._avg_search)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+def _unit(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec